@@ -0,0 +1,68 @@
+"""Memory used by each node and edge of a graph
+
+Runs outside of Ren'Py with the stand-ins of benchmarks/standin.py. The
+graph is a chain of statements where each node has a few conditional
+edges, as after simplification. Needs tracemalloc (Python 3).
+
+    python benchmarks/objects.py [nodes]
+"""
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from standin import install
+
+
+
+def build(renpy, count):
+    from renpath.classes.edge import Edge
+    from renpath.classes.graph import Graph
+    from renpath.node_generation import _new_node
+    from renpath.screens import NO_SCREENS
+
+    statements = []
+    for i in range(count):
+        statement = renpy.ast.Say()
+        statement.filename = "script.rpy"
+        statement.linenumber = i + 1
+        statements.append(statement)
+
+    snapshot = tracemalloc.take_snapshot()
+    graph = Graph()
+    nodes = [_new_node(graph, statement, [], NO_SCREENS) for statement in statements]
+    after_nodes = tracemalloc.take_snapshot()
+
+    for i, node in enumerate(nodes):
+        for offset, condition, choice in ((1, "True", None), (2, "flag_{}".format(i % 7), None), (3, "True", "Jump " + "label_{}".format(i % 11))):
+            end = nodes[(i + offset) % count]
+            edge = Edge(node, end, condition, choice)
+            node.children.add(edge)
+            end.parents.add(edge)
+            graph.add_edge(edge)
+    after_edges = tracemalloc.take_snapshot()
+
+    def size(start, stop):
+        return sum(stat.size_diff for stat in stop.compare_to(start, "filename"))
+
+    return size(snapshot, after_nodes), size(after_nodes, after_edges), len(graph.edges), graph
+
+def main():
+    renpy = install()
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    tracemalloc.start()
+    node_bytes, edge_bytes, edges, graph = build(renpy, count)
+    tracemalloc.stop()
+
+    from renpath.classes.edge import Edge
+    node = graph.nodes[0]
+    edge = graph.edges[0]
+    print("{} nodes: {:.0f} bytes per node (with its index entry)".format(count, float(node_bytes) / count))
+    print("{} edges: {:.0f} bytes per edge (with its index entry and adjacency)".format(edges, float(edge_bytes) / edges))
+    print("Node instance: {} bytes, Edge instance: {} bytes (without containers)".format(
+        sys.getsizeof(node) + (sys.getsizeof(node.__dict__) if hasattr(node, "__dict__") else 0),
+        sys.getsizeof(edge) + (sys.getsizeof(edge.__dict__) if hasattr(edge, "__dict__") else 0),
+    ))
+
+if __name__ == "__main__":
+    main()
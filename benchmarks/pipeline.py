@@ -0,0 +1,132 @@
+"""Time and peak memory of each phase of renpath on a synthetic script
+
+Runs outside of Ren'Py with the stand-ins of benchmarks/standin.py and the
+scripts of benchmarks/synthetic.py. Peak memory needs tracemalloc
+(Python 3), which slows everything down: use --no-memory for the times
+alone. With --baseline, exits with 1 when a phase got slower or bigger
+than the baseline by more than the tolerance.
+
+    python benchmarks/pipeline.py [--labels 200] [--output results.json] [--baseline results.json]
+"""
+import argparse
+import io
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from standin import install
+from synthetic import generate
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+try:
+    from time import perf_counter
+except ImportError:
+    from time import time as perf_counter
+
+
+
+class Phases(object):
+    """Runs the phases one after the other, recording their time and peak memory"""
+
+    def __init__(self, memory):
+        self.memory = memory and tracemalloc is not None
+        self.results = [] # (name, seconds, peak bytes or None)
+
+    def run(self, name, function, *args, **kwargs):
+        if self.memory:
+            tracemalloc.start()
+        start = perf_counter()
+        result = function(*args, **kwargs)
+        elapsed = perf_counter() - start
+        peak = None
+        if self.memory:
+            peak = tracemalloc.get_traced_memory()[1] # Only the memory allocated during the phase
+            tracemalloc.stop()
+        self.results.append((name, elapsed, peak))
+        return result
+
+    def to_json(self):
+        return dict((name, {"seconds": elapsed, "peak_bytes": peak}) for name, elapsed, peak in self.results)
+
+def pipeline(phases, args):
+    script, screens = phases.run("generate", generate,
+        labels=args.labels, fanout=args.fanout, call_depth=args.call_depth,
+        if_chain=args.if_chain, screens=args.screens, seed=args.seed)
+    install(script, screens)
+
+    from renpath import metrics
+    from renpath.classes.graph import Graph
+    from renpath.conversion import convert
+    from renpath.node_generation import _next__minimalist
+    from renpath.simplification import simplify
+
+    metrics.PROFILE = args.profile
+    metrics.TRACE_MEMORY = False # Measured here, without resetting the peak in the middle of a phase
+    graph = phases.run("convert", convert, script.lookup("start"), None, _next__minimalist, args.max_call_depth)
+    counts = {"statements": len(script.all_stmts), "converted_nodes": len(graph.nodes), "converted_edges": len(graph.edges)}
+    phases.run("simplify", simplify, graph, simplify_menus=True)
+    counts.update(nodes=len(graph.nodes), edges=len(graph.edges))
+    serial = phases.run("serialize", graph.serialize, compact=True)
+    phases.run("deserialize", Graph.deserialize, serial)
+    phases.run("freeze", graph.freeze)
+    phases.run("vizualize", graph.vizualize, io.StringIO())
+    return counts, graph.metrics.to_json()
+
+def compare(results, baseline, tolerance):
+    """Phases slower or bigger than in the baseline"""
+    regressions = []
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            continue
+        for key in ("seconds", "peak_bytes"):
+            old, new = baseline[name].get(key), result[key]
+            if old and new is not None and new > old * (1 + tolerance):
+                regressions.append("{} {}: {:.4g} -> {:.4g} (+{:.0%})".format(name, key, old, new, float(new) / old - 1))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--labels", type=int, default=200)
+    parser.add_argument("--fanout", type=int, default=3)
+    parser.add_argument("--call-depth", type=int, default=3)
+    parser.add_argument("--if-chain", type=int, default=3)
+    parser.add_argument("--screens", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-call-depth", type=int, default=None)
+    parser.add_argument("--no-memory", action="store_true", help="do not trace the memory, for accurate times")
+    parser.add_argument("--profile", action="store_true", help="times each generate_children, by node type")
+    parser.add_argument("--output", help="writes the results as JSON")
+    parser.add_argument("--baseline", help="results of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed growth over the baseline (0.25 for 25%%)")
+    args = parser.parse_args()
+
+    phases = Phases(not args.no_memory)
+    counts, metrics = pipeline(phases, args)
+
+    print(", ".join("{} {}".format(value, name.replace("_", " ")) for name, value in sorted(counts.items())))
+    print(", ".join("{} {}".format(value, name.replace("_", " ")) for name, value in sorted(metrics["totals"].items())))
+    print("{:<12} {:>10} {:>12}".format("phase", "time (ms)", "peak (KiB)"))
+    for name, elapsed, peak in phases.results:
+        print("{:<12} {:>10.1f} {:>12}".format(name, elapsed * 1000, "{:.0f}".format(peak / 1024.0) if peak is not None else "-"))
+
+    results = phases.to_json()
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"parameters": vars(args), "counts": counts, "phases": results, "metrics": metrics}, f, indent=4, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)["phases"]
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print("Regression: " + regression)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
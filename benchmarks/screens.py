@@ -0,0 +1,47 @@
+"""Size and time of the screen templates for deeply nested screens
+
+Runs outside of Ren'Py with the stand-ins of benchmarks/standin.py. Each
+level of nesting adds one button, so the number of connections must grow
+linearly with the depth.
+
+    python benchmarks/screens.py [max depth]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from standin import SLBlock, SLDisplayable, SLIf, SLScreen, ScreenOrigin, install
+
+
+
+def nested_screen(depth):
+    # type: (int) -> SLScreen
+    """vbox and hbox alternating, each with a button and an if around the next level"""
+    inner = None
+    for level in reversed(range(depth)):
+        button = SLDisplayable(keyword=[("action", "Jump('label_{}')".format(level))])
+        children = [button]
+        if inner is not None:
+            children.append(SLIf(entries=[("flag_{}".format(level), SLBlock(children=[inner]))]))
+        inner = SLDisplayable(children=children) # vbox or hbox, the same for renpath
+    return SLScreen(children=[inner])
+
+def main():
+    install()
+    from renpath.screens import Screen
+
+    max_depth = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    print("{:>6} {:>12} {:>10}".format("depth", "connections", "time (ms)"))
+    depth = 1
+    while depth <= max_depth:
+        screen = Screen(ScreenOrigin(nested_screen(depth)))
+        start = time.time()
+        template = screen.template
+        elapsed = (time.time() - start) * 1000
+        assert len(template) == depth, "{} connections for {} buttons".format(len(template), depth)
+        print("{:>6} {:>12} {:>10.3f}".format(depth, len(template), elapsed))
+        depth *= 2
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""Stand-ins for the parts of renpy used by renpath, to run it outside of Ren'Py
+
+Call `install()` before importing renpath. Statements are chained as
+Ren'Py does once the script is loaded: `next` is the following statement,
+blocks (labels, menu choices, if entries) fall through to the statement
+after them. `Script` holds them as `renpy.game.script`.
+"""
+import ast
+import sys
+import types
+
+
+
+class Node(object):
+    """renpy.ast.Node"""
+
+    def __init__(self, filename="script.rpy", linenumber=0):
+        self.filename = filename
+        self.linenumber = linenumber
+        self.next = None
+
+    def get_code(self):
+        return self.__class__.__name__.lower()
+
+class Label(Node):
+    def __init__(self, name="", block=(), **kwargs):
+        super(Label, self).__init__(**kwargs)
+        self.name = name
+        self.block = list(block)
+
+    def get_code(self):
+        return "label {}:".format(self.name)
+
+class Jump(Node):
+    def __init__(self, target="", expression=False, **kwargs):
+        super(Jump, self).__init__(**kwargs)
+        self.target = target
+        self.expression = expression
+
+    def get_code(self):
+        return "jump " + self.target
+
+class Call(Node):
+    def __init__(self, label="", expression=False, **kwargs):
+        super(Call, self).__init__(**kwargs)
+        self.label = label
+        self.expression = expression
+
+    def get_code(self):
+        return "call " + self.label
+
+class Return(Node): pass
+
+class Menu(Node):
+    def __init__(self, items=(), **kwargs):
+        super(Menu, self).__init__(**kwargs)
+        self.items = list(items) # (text, condition, block)
+
+    def get_code(self):
+        return "menu:"
+
+class If(Node):
+    def __init__(self, entries=(), **kwargs):
+        super(If, self).__init__(**kwargs)
+        self.entries = list(entries) # (condition, block)
+
+    def get_code(self):
+        return "if {}:".format(self.entries[0][0])
+
+class PyCode(object):
+    def __init__(self, source):
+        self.source = source
+
+class Python(Node):
+    def __init__(self, source="", **kwargs):
+        super(Python, self).__init__(**kwargs)
+        self.code = PyCode(source)
+
+    def get_code(self):
+        return "$ " + self.code.source
+
+class UserStatement(Node):
+    def __init__(self, name="", arguments=None, **kwargs):
+        super(UserStatement, self).__init__(**kwargs)
+        self.name = name
+        self.parsed = (name, arguments or {})
+
+    def get_name(self):
+        return self.name
+
+    def get_code(self):
+        return "{} {}".format(self.name, self.parsed[1].get("name", ""))
+
+class Say(Node):
+    def __init__(self, what="", **kwargs):
+        super(Say, self).__init__(**kwargs)
+        self.what = what
+
+    def get_code(self):
+        return repr(self.what)
+
+class Pass(Node): pass
+class Translate(Node): pass
+class EndTranslate(Node): pass
+
+AST_NODES = (Node, Label, Jump, Call, Return, Menu, If, Python, UserStatement, Say, Pass, Translate, EndTranslate)
+
+
+
+class ScriptError(Exception):
+    """renpy.script.ScriptError"""
+
+class Script(object):
+    """renpy.game.script, for statements chained with `chain`"""
+
+    def __init__(self, statements=()):
+        self.all_stmts = list(statements)
+        self.namemap = dict((statement.name, statement) for statement in self.all_stmts if isinstance(statement, Label))
+
+    def lookup_or_none(self, name):
+        name = sys.modules["renpy"].config.label_overrides.get(name, name)
+        return self.namemap.get(name)
+
+    def lookup(self, name):
+        name = sys.modules["renpy"].config.label_overrides.get(name, name)
+        if name not in self.namemap:
+            raise ScriptError("could not find label '{}'.".format(name))
+        return self.namemap[name]
+
+def chain(block, next_=None):
+    """Links the statements of the block (and of the blocks inside them) as Ren'Py does, returns them in order"""
+    statements = []
+    for i, statement in enumerate(block):
+        after = block[i + 1] if i + 1 < len(block) else next_
+        statements.append(statement)
+        if isinstance(statement, Label):
+            statement.next = statement.block[0] if statement.block else after
+            statements += chain(statement.block, after)
+        else:
+            statement.next = after
+        if isinstance(statement, Menu):
+            for _, _, choice in statement.items:
+                if choice is not None:
+                    statements += chain(choice, after)
+        if isinstance(statement, If):
+            for _, entry in statement.entries:
+                statements += chain(entry, after)
+    return statements
+
+
+
+class SLNode(object):
+    def __init__(self, children=(), keyword=(), entries=()):
+        self.children = list(children)
+        self.keyword = list(keyword)
+        self.entries = list(entries)
+
+class SLScreen(SLNode):
+    def __init__(self, name="nested", **kwargs):
+        super(SLScreen, self).__init__(**kwargs)
+        self.name = name
+
+    def analyze_screen(self):
+        pass
+
+class SLDisplayable(SLNode): pass
+class SLBlock(SLNode): pass
+class SLIf(SLNode): pass
+class SLDefault(SLNode): pass
+class SLFor(SLNode): pass
+class SLPython(SLNode): pass
+class SLShowIf(SLNode): pass
+class SLUse(SLNode): pass
+
+class ScreenOrigin(object):
+    """What renpy.display.screen.screens holds"""
+
+    def __init__(self, function):
+        self.function = function
+
+class CompilerCache(object):
+    def ast_eval(self, source):
+        return ast.parse(source, mode="eval").body
+
+def install(script=None, screens=None, basedir="."):
+    """Registers the stand-ins as the renpy module
+
+    script: `Script` for renpy.game.script (can be set later)
+    screens: SLScreen by name, for renpy.display.screen.screens
+    """
+    renpy = types.ModuleType("renpy")
+    renpy.ast = types.ModuleType("renpy.ast")
+    for cls in AST_NODES:
+        setattr(renpy.ast, cls.__name__, cls)
+    renpy.script = types.ModuleType("renpy.script")
+    renpy.script.ScriptError = ScriptError
+    renpy.game = types.ModuleType("renpy.game")
+    renpy.game.script = script if script is not None else Script()
+    renpy.config = types.ModuleType("renpy.config")
+    renpy.config.basedir = basedir
+    renpy.config.label_overrides = {}
+    renpy.sl2 = types.ModuleType("renpy.sl2")
+    renpy.sl2.slast = types.ModuleType("renpy.sl2.slast")
+    for cls in (SLNode, SLScreen, SLDisplayable, SLBlock, SLIf, SLDefault, SLFor, SLPython, SLShowIf, SLUse):
+        setattr(renpy.sl2.slast, cls.__name__, cls)
+    renpy.pyanalysis = types.ModuleType("renpy.pyanalysis")
+    renpy.pyanalysis.CompilerCache = CompilerCache
+    renpy.display = types.ModuleType("renpy.display")
+    renpy.display.log = types.ModuleType("renpy.display.log")
+    renpy.display.log.write = lambda message: None
+    renpy.display.screen = types.ModuleType("renpy.display.screen")
+    renpy.display.screen.Screen = ScreenOrigin
+    renpy.display.screen.screens = dict(((name, None), ScreenOrigin(screen)) for name, screen in (screens or {}).items())
+    sys.modules["renpy"] = renpy
+    return renpy
@@ -0,0 +1,97 @@
+"""Synthetic scripts for the benchmarks, built with the stand-ins of benchmarks/standin.py
+
+Each label says a few lines, goes through a chain of ifs, calls a
+subroutine, shows a screen, and ends with a menu whose choices jump to
+other labels. The subroutines call each other down to the call depth.
+Everything is deterministic for a given seed.
+"""
+import random
+
+from standin import (
+    Call, If, Jump, Label, Menu, Python, Return, Say, Script, SLBlock, SLDisplayable, SLIf, SLScreen, UserStatement, chain
+)
+
+
+
+class _Lines(object):
+    """Creates the statements with their location, numbered in order in the current file"""
+
+    def __init__(self):
+        self.filename = "script.rpy"
+        self.linenumber = 0
+
+    def __call__(self, cls, *args, **kwargs):
+        self.linenumber += 1
+        return cls(*args, filename=self.filename, linenumber=self.linenumber, **kwargs)
+
+def screen(name, labels, buttons, random_):
+    """A vbox of buttons jumping to labels, every other one behind an if"""
+    children = []
+    for i in range(buttons):
+        button = SLDisplayable(keyword=[("action", "Jump('{}')".format(random_.choice(labels)))])
+        if i % 2:
+            button = SLIf(entries=[("screen_flag_{}".format(i), SLBlock(children=[button]))])
+        children.append(button)
+    return SLScreen(name=name, children=[SLDisplayable(children=children)])
+
+def generate(labels=100, fanout=3, call_depth=3, if_chain=3, screens=4, says=5, seed=0):
+    """Script and screens (by name) of a synthetic game starting at the label "start"
+
+    labels: number of labels of the main story
+    fanout: choices of the menu ending each label
+    call_depth: nesting of the subroutines called by each label (0 for none)
+    if_chain: entries of the if in each label
+    screens: number of screens, each label shows one (0 for none)
+    says: lines said around the branching statements
+    """
+    random_ = random.Random(seed)
+    line = _Lines()
+    names = ["start"] + ["label_{}".format(i) for i in range(1, labels)]
+    subroutines = 3 if call_depth else 0 # Per level
+
+    def talk():
+        return [line(Say, "Line {}".format(line.linenumber)) for _ in range(says)]
+
+    blocks = []
+    for i, name in enumerate(names):
+        line.filename = "script_{}.rpy".format(i % 8)
+        label = line(Label, name)
+        block = talk()
+        if if_chain:
+            entries = [("flag_{}".format(random_.randrange(labels)), talk() + [line(Python, "points += 1")]) for _ in range(if_chain - 1)]
+            entries.append(("True", talk())) # else
+            block.append(line(If, entries))
+        if call_depth:
+            block.append(line(Call, "sub_0_{}".format(random_.randrange(subroutines))))
+            block += talk()
+        if screens:
+            block.append(line(UserStatement, "show screen", {"name": "screen_{}".format(i % screens)}))
+            block += talk()
+            block.append(line(UserStatement, "hide screen", {"name": "screen_{}".format(i % screens)}))
+        if i + 1 == labels:
+            block.append(line(Return))
+        else:
+            choices = [("Choice {}".format(k), "True", talk() + [line(Jump, random_.choice(names[i + 1:]))]) for k in range(fanout - 1)]
+            choices.append(("Continue", "True", [line(Jump, names[i + 1])])) # Every label is reached
+            block.append(line(Menu, choices))
+        label.block = block
+        blocks.append(label)
+
+    line.filename = "subroutines.rpy"
+    for depth in range(call_depth):
+        for k in range(subroutines):
+            label = line(Label, "sub_{}_{}".format(depth, k))
+            block = talk()
+            if depth + 1 < call_depth:
+                block.append(line(Call, "sub_{}_{}".format(depth + 1, random_.randrange(subroutines))))
+                block += talk()
+            block.append(line(Return))
+            label.block = block
+            blocks.append(label)
+
+    script = Script(chain(blocks))
+    functions = dict(
+        ("screen_{}".format(k), screen("screen_{}".format(k), names, 4, random_))
+        for k in range(screens)
+    )
+    return script, functions
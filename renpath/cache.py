@@ -0,0 +1,107 @@
+import hashlib
+import os
+from renpath import renpy
+from .typing import Iterable, Optional, Union
+
+from .classes.graph import Graph
+from .conversion import convert
+from .simplification import simplify
+from .metrics import Metrics
+from .utility import script_digests
+
+def __mock_imports(): # type: ignore
+    # Mock imports for the linter
+    global NextGetter
+    from node_generation import NextGetter
+
+
+
+MAX_ENTRIES = 8 # Graphs kept on disk, the least recently used ones are removed first
+CACHE_VERSION = 1 # Change when the serialization or the algorithms change
+METRICS = ".metrics.json" # Next to each entry, for the last run that used it
+
+
+
+def _fingerprint(start_rpynode, end_rpynode, next_getter, max_call_depth, simplify_menus, python_ignore):
+    # type: (renpy.ast.Node, Union[renpy.ast.Node, None], NextGetter, Optional[int], bool, Optional[Iterable[str]]) -> str
+    """Hash of the script files and of everything the graph depends on"""
+    digest = hashlib.sha1()
+
+    def update(value):
+        # type: (object) -> None
+        digest.update(repr(value).encode("utf-8"))
+        digest.update(b"\0")
+
+    update(CACHE_VERSION)
+    update(sorted(script_digests().items()))
+
+    for rpynode in (start_rpynode, end_rpynode):
+        if rpynode is None:
+            update(None)
+        else:
+            update((rpynode.filename, rpynode.linenumber))
+    next_getter = getattr(next_getter, "next_getter", next_getter) # Memoized
+    update((getattr(next_getter, "__module__", None), getattr(next_getter, "__name__", repr(next_getter))))
+    update(max_call_depth)
+    update(simplify_menus)
+    update(None if python_ignore is None else list(python_ignore))
+    return digest.hexdigest()
+
+def _evict(directory, max_entries):
+    # type: (str, int) -> None
+    paths = [os.path.join(directory, filename) for filename in os.listdir(directory) if filename.endswith(".json") and not filename.endswith(METRICS)]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    for path in paths[max_entries:]:
+        for entry in (path, path[:-len(".json")] + METRICS):
+            try:
+                os.remove(entry)
+            except OSError:
+                pass
+
+def _load(path):
+    # type: (str) -> Graph
+    with open(path, "r") as f:
+        return Graph.deserialize(f)
+
+def _store(graph, path):
+    # type: (Graph, str) -> None
+    # Written next to the entry then renamed, a crash never leaves half an entry
+    temporary = path + ".tmp"
+    with open(temporary, "w") as f:
+        graph.serialize(f, compact=True)
+    if os.path.exists(path):
+        os.remove(path) # Python 2 on Windows cannot rename over a file
+    os.rename(temporary, path)
+
+def cached_convert(start_rpynode, end_rpynode, next_getter, max_call_depth=None, simplify_menus=False, python_ignore=None, directory=None, max_entries=MAX_ENTRIES):
+    # type: (renpy.ast.Node, Union[renpy.ast.Node, None], NextGetter, Optional[int], bool, Optional[Iterable[str]], Optional[str], int) -> Graph
+    """Converts and simplifies the script, or loads the graph stored the last time nothing changed"""
+    if directory is None:
+        directory = os.path.join(renpy.config.basedir, "renpath_cache") # type: ignore
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    key = _fingerprint(start_rpynode, end_rpynode, next_getter, max_call_depth, simplify_menus, python_ignore)
+    path = os.path.join(directory, key + ".json")
+
+    if os.path.exists(path):
+        metrics = Metrics()
+        try:
+            graph = metrics.phase("Cache hit: loading", _load, path)
+        except Exception as e:
+            renpy.display.log.write("Cache entry {} unreadable: {}".format(key, e))
+        else:
+            os.utime(path, None) # Most recently used
+            graph.metrics = metrics
+            graph.metrics.dump(os.path.join(directory, key + METRICS))
+            graph.stats["cache"] = "hit"
+            return graph
+
+    renpy.display.log.write("Cache miss: " + key)
+    graph = convert(start_rpynode, end_rpynode, next_getter, max_call_depth)
+    simplify(graph, simplify_menus, python_ignore)
+    graph.metrics.phase("Cache store", _store, graph, path)
+    graph.metrics.dump(os.path.join(directory, key + METRICS))
+    _evict(directory, max_entries)
+    graph.stats["cache"] = "miss"
+    return graph
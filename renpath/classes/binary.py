@@ -0,0 +1,191 @@
+import mmap
+import struct
+import sys
+from array import array
+from ..typing import IO, Iterable, List, Optional, Tuple
+
+from .ids import StringTable, callers, numbered
+
+def __mock_imports(): # type: ignore
+    # Mock imports for the linter
+    global Graph, Node
+    from graph import Graph
+    from node import Node
+
+
+
+MAGIC = b"RPGB"
+VERSION = 1
+
+# Little-endian everywhere, every record is made of int32 with -1 for none:
+#   header      magic, version, node count, edge count, adjacency length, string count, string data length
+#   nodes       file, line, children (offset, count), parents (offset, count), callers (offset, count)
+#   edges       start, end, condition, choice
+#   adjacency   edge ids for the children and parents, node ids for the callers
+#   strings     offsets (string count + 1) then the UTF-8 data
+_HEADER = struct.Struct("<4s6i")
+_NODE = struct.Struct("<8i")
+_EDGE = struct.Struct("<4i")
+_INT = struct.Struct("<i")
+
+
+
+def _write_ints(stream, ints):
+    # type: (IO[bytes], Iterable[int]) -> None
+    data = array("i", ints)
+    if sys.byteorder != "little":
+        data.byteswap()
+    stream.write(data.tobytes() if hasattr(data, "tobytes") else data.tostring()) # type: ignore # Python 2
+
+def dump(graph, stream):
+    # type: (Graph, IO[bytes]) -> None
+    """Writes the graph in the binary format, to be read with `MappedGraph`
+
+    Ids are the positions in `Graph.nodes` and `Graph.edges`, as in
+    `Graph.serialize`. Like the serial, screens are not kept.
+    """
+    nodes, edges, node_ids, edge_ids = numbered(graph)
+    table = StringTable(-1)
+    string_id = table.id
+
+    node_records = [] # type: List[int]
+    adjacency = [] # type: List[int]
+    for node in nodes:
+        node_records.append(string_id(node.origin.filename))
+        node_records.append(node.origin.linenumber)
+        for ids in (
+            [edge_ids[child] for child in node.children],
+            [edge_ids[parent] for parent in node.parents],
+            [caller if caller is not None else -1 for caller in callers(node, node_ids)],
+        ):
+            node_records.append(len(adjacency))
+            node_records.append(len(ids))
+            adjacency.extend(ids)
+
+    edge_records = [] # type: List[int]
+    for edge in edges:
+        edge_records.extend((node_ids[edge.start], node_ids[edge.end], string_id(edge.condition), string_id(edge.choice)))
+
+    strings = [text.encode("utf-8") if not isinstance(text, bytes) else text for text in table.strings]
+    string_offsets = [0]
+    for data in strings:
+        string_offsets.append(string_offsets[-1] + len(data))
+
+    stream.write(_HEADER.pack(MAGIC, VERSION, len(nodes), len(edges), len(adjacency), len(strings), string_offsets[-1]))
+    _write_ints(stream, node_records)
+    _write_ints(stream, edge_records)
+    _write_ints(stream, adjacency)
+    _write_ints(stream, string_offsets)
+    for data in strings:
+        stream.write(data)
+
+class MappedGraph(object):
+    """Graph written by `dump`, read in place through `mmap`
+
+    Only the header is decoded when opening the file: neighbours, edges,
+    strings and locations are read from the mapping when asked for, so
+    tools can query large graphs without deserializing them. Use
+    `to_graph` to get a `Graph` back, as `Graph.deserialize` would.
+    """
+
+    def __init__(self, path):
+        # type: (str) -> None
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.node_count, self.edge_count, adjacency_length, self.string_count, _ = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError("{} is not a binary graph".format(path))
+        if version != VERSION:
+            self.close()
+            raise ValueError("{} has version {} of the binary format, expected {}".format(path, version, VERSION))
+        self._nodes = _HEADER.size
+        self._edges = self._nodes + self.node_count * _NODE.size
+        self._adjacency = self._edges + self.edge_count * _EDGE.size
+        self._string_offsets = self._adjacency + adjacency_length * _INT.size
+        self._string_data = self._string_offsets + (self.string_count + 1) * _INT.size
+
+    def close(self):
+        # type: () -> None
+        self._map.close()
+
+    def __enter__(self):
+        # type: () -> MappedGraph
+        return self
+
+    def __exit__(self, *args):
+        # type: (*object) -> None
+        self.close()
+
+    def __len__(self):
+        # type: () -> int
+        return self.node_count
+
+    def _ints(self, offset, count):
+        # type: (int, int) -> Tuple[int, ...]
+        return struct.unpack_from("<{}i".format(count), self._map, self._adjacency + offset * _INT.size)
+
+    def _node(self, node):
+        # type: (int) -> Tuple[int, ...]
+        if not 0 <= node < self.node_count:
+            raise IndexError(node)
+        return _NODE.unpack_from(self._map, self._nodes + node * _NODE.size)
+
+    def string(self, string):
+        # type: (int) -> Optional[str]
+        if string < 0:
+            return None
+        start, end = struct.unpack_from("<2i", self._map, self._string_offsets + string * _INT.size)
+        return self._map[self._string_data + start:self._string_data + end].decode("utf-8")
+
+    def edge(self, edge):
+        # type: (int) -> Tuple[int, int, str, Optional[str]]
+        """(start, end, condition, choice) of the edge"""
+        if not 0 <= edge < self.edge_count:
+            raise IndexError(edge)
+        start, end, condition, choice = _EDGE.unpack_from(self._map, self._edges + edge * _EDGE.size)
+        return start, end, self.string(condition), self.string(choice) # type: ignore
+
+    def location(self, node):
+        # type: (int) -> Tuple[str, int]
+        record = self._node(node)
+        return self.string(record[0]), record[1] # type: ignore
+
+    def children(self, node):
+        # type: (int) -> Tuple[int, ...]
+        """Ids of the outgoing edges, in order"""
+        record = self._node(node)
+        return self._ints(record[2], record[3])
+
+    def parents(self, node):
+        # type: (int) -> Tuple[int, ...]
+        """Ids of the incoming edges, in order"""
+        record = self._node(node)
+        return self._ints(record[4], record[5])
+
+    def callers(self, node):
+        # type: (int) -> List[Optional[int]]
+        record = self._node(node)
+        return [caller if caller >= 0 else None for caller in self._ints(record[6], record[7])]
+
+    def successors(self, node):
+        # type: (int) -> List[int]
+        return [_EDGE.unpack_from(self._map, self._edges + edge * _EDGE.size)[1] for edge in self.children(node)]
+
+    def predecessors(self, node):
+        # type: (int) -> List[int]
+        return [_EDGE.unpack_from(self._map, self._edges + edge * _EDGE.size)[0] for edge in self.parents(node)]
+
+    def to_graph(self):
+        # type: () -> Graph
+        from .graph import Graph # Local to prevent circular imports
+        locations = []
+        for node in range(self.node_count):
+            filename, linenumber = self.location(node)
+            locations.append(filename + "#" + str(linenumber))
+        return Graph._build(
+            locations,
+            (self.parents(node) for node in range(self.node_count)),
+            (self.children(node) for node in range(self.node_count)),
+            [self.edge(edge) for edge in range(self.edge_count)]
+        )
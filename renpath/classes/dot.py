@@ -0,0 +1,196 @@
+import os
+import re
+from bisect import bisect_right
+from collections import OrderedDict
+from renpath import renpy
+from ..conditions import TRUE
+from ..typing import IO, Any, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from .edge import Edge
+
+def __mock_imports(): # type: ignore
+    # Mock imports for the linter
+    global Graph, Node
+    from graph import Graph
+    from node import Node
+
+
+
+PARTITIONS = (None, "file", "label")
+
+_UNSAFE = re.compile(r"[^\w.-]+") # In partition filenames
+
+
+
+def _escape(text):
+    # type: (str) -> str
+    return text.replace("\"", "\\\"").replace("\n", "\\n")
+
+def _node_label(node):
+    # type: (Node) -> str
+    # TODO: Better label
+    return _escape(repr(node))
+
+def _edge_label(edge):
+    # type: (Edge) -> str
+    label = ""
+    if edge.choice is not None:
+        label = edge.choice
+    if edge.condition is not TRUE:
+        label += "\nif " + str(edge.condition)
+    elif edge.choice is None and len(edge.start.children) > 1:
+        label = "else"
+    return _escape(label.strip())
+
+def _write_edge(write, start, end, edge):
+    # type: (Callable[[str], Any], Union[int, str], Union[int, str], Edge) -> None
+    label = _edge_label(edge)
+    if label:
+        write("\t{} -> {} [label=\"{}\"]\n".format(start, end, label))
+    else:
+        write("\t{} -> {}\n".format(start, end))
+
+def _by_file(nodes):
+    # type: (List[Node]) -> List[str]
+    return [node.origin.filename if node.origin is not None else "" for node in nodes]
+
+def _by_label(nodes):
+    # type: (List[Node]) -> List[str]
+    # Each node goes with the label it is under in its file, "" when there is none
+    # From the script: simplify removes the labels from the graph
+    labels = {} # type: Dict[str, List[Tuple[int, str]]] # By file, sorted by line
+    for rpynode in renpy.game.script.all_stmts: # type: ignore
+        if isinstance(rpynode, renpy.ast.Label):
+            labels.setdefault(rpynode.filename, []).append((rpynode.linenumber, rpynode.name))
+    lines = {} # type: Dict[str, List[int]]
+    for filename, file_labels in labels.items():
+        file_labels.sort()
+        lines[filename] = [linenumber for linenumber, _ in file_labels]
+
+    partitions = [] # type: List[str]
+    for node in nodes:
+        origin = node.origin
+        k = bisect_right(lines.get(origin.filename, []), origin.linenumber) if origin is not None else 0
+        partitions.append(labels[origin.filename][k - 1][1] if k else "")
+    return partitions
+
+def _open(output):
+    # type: (Union[str, IO[str]]) -> Any
+    # Files given by the caller are left open
+    if hasattr(output, "write"):
+        return _Borrowed(output)
+    return open(output, "w") # type: ignore
+
+class _Borrowed(object):
+    def __init__(self, stream):
+        # type: (IO[str]) -> None
+        self.stream = stream
+
+    def __enter__(self):
+        # type: () -> IO[str]
+        return self.stream
+
+    def __exit__(self, *args):
+        # type: (*object) -> None
+        pass
+
+def write_dot(graph, output="path.dot", partition=None, separate=False):
+    # type: (Graph, Union[str, IO[str]], Optional[str], bool) -> List[str]
+    """Writes the graph for Graphviz, line by line
+
+    output: path or file object
+    partition: None, "file" (script file of the nodes) or "label" (label
+        the nodes are under in the script), each partition being a
+        `subgraph cluster_*`
+    separate: writes each partition to its own file instead, next to the
+        output path (`path.<k>.<partition>.dot`, k numbering the partitions
+        in order of appearance). Edges leaving or entering a
+        partition go to a dashed stub of the node on the other side.
+
+    Returns the paths written, empty when output is a file object.
+    """
+    if partition not in PARTITIONS:
+        raise ValueError("Unknown partition {!r}, expected one of {}".format(partition, PARTITIONS))
+    if separate and (partition is None or hasattr(output, "write")):
+        raise ValueError("Separate files need a partition and an output path")
+
+    # Ids are the positions in the views, assigned once
+    nodes = graph.nodes
+    node_ids = dict((node, i) for i, node in enumerate(nodes)) # type: Dict[Node, int]
+    if partition is None:
+        partitions = [""] * len(nodes)
+    elif partition == "file":
+        partitions = _by_file(nodes)
+    else:
+        partitions = _by_label(nodes)
+
+    # Partitions in order of first appearance, with their nodes
+    members = OrderedDict() # type: OrderedDict[str, List[int]]
+    for i, name in enumerate(partitions):
+        members.setdefault(name, []).append(i)
+
+    if not separate:
+        with _open(output) as f:
+            _write_single(f.write, graph, nodes, node_ids, members if partition is not None else None)
+        return [] if hasattr(output, "write") else [output] # type: ignore
+
+    stem, extension = os.path.splitext(output) # type: ignore
+    paths = []
+    for k, name in enumerate(members):
+        safe = _UNSAFE.sub("_", name) # Can collide ("a b" and "a_b"), the number keeps the paths apart
+        path = "{}.{}{}{}".format(stem, k, "." + safe if safe else "", extension or ".dot")
+        with open(path, "w") as f:
+            _write_partition(f.write, nodes, node_ids, partitions, name, members[name])
+        paths.append(path)
+    return paths
+
+def _write_single(write, graph, nodes, node_ids, members):
+    # type: (Callable[[str], Any], Graph, List[Node], Dict[Node, int], Optional[Dict[str, List[int]]]) -> None
+    write("digraph path {\n")
+    if members is None:
+        for i, node in enumerate(nodes):
+            write("\t{} [label=\"{}\"]\n".format(i, _node_label(node)))
+    else:
+        for k, (name, ids) in enumerate(members.items()):
+            write("\tsubgraph cluster_{} {{\n".format(k))
+            write("\t\tlabel=\"{}\"\n".format(_escape(name)))
+            for i in ids:
+                write("\t\t{} [label=\"{}\"]\n".format(i, _node_label(nodes[i])))
+            write("\t}\n")
+    for edge in graph.edges:
+        start = node_ids.get(edge.start)
+        end = node_ids.get(edge.end)
+        if start is None or end is None:
+            continue # Removed from the graph
+        _write_edge(write, start, end, edge)
+    write("}\n")
+
+def _write_partition(write, nodes, node_ids, partitions, name, ids):
+    # type: (Callable[[str], Any], List[Node], Dict[Node, int], List[str], str, List[int]) -> None
+    write("digraph path {\n")
+    write("\tlabel=\"{}\"\n".format(_escape(name)))
+    for i in ids:
+        write("\t{} [label=\"{}\"]\n".format(i, _node_label(nodes[i])))
+
+    stubs = set() # type: Set[int]
+    def stub(i):
+        # type: (int) -> str
+        if i not in stubs:
+            stubs.add(i)
+            label = _escape(partitions[i]) + "\\n" + _node_label(nodes[i])
+            write("\tstub_{} [label=\"{}\", style=dashed]\n".format(i, label))
+        return "stub_{}".format(i)
+
+    for i in ids:
+        node = nodes[i]
+        for edge in node.children:
+            j = node_ids.get(edge.end)
+            if j is None:
+                continue # Removed from the graph
+            _write_edge(write, i, j if partitions[j] == name else stub(j), edge)
+        for edge in node.parents:
+            j = node_ids.get(edge.start)
+            if j is None or partitions[j] == name:
+                continue # Written with the children of its start
+            _write_edge(write, stub(j), i, edge)
+    write("}\n")
@@ -1,4 +1,10 @@
-from ..typing import Optional
+from ..conditions import TRUE, Condition, as_condition
+from ..typing import Optional, Union
+
+try:
+    from sys import intern
+except ImportError:
+    pass # Python 2: builtin
 
 def __mock_imports(): # type: ignore
     # Mock imports for the linter
@@ -8,13 +14,15 @@ def __mock_imports(): # type: ignore
 
 
 
-class Edge:
+class Edge(object):
+    __slots__ = ("start", "end", "condition", "choice")
+
     def __init__(self, start, end, condition="True", choice=None):
-        # type: (Node, Node, str, Optional[str]) -> None
+        # type: (Node, Node, Union[Condition, str], Optional[str]) -> None
         self.start = start
         self.end = end
-        self.condition = condition
-        self.choice = choice
+        self.condition = as_condition(condition) # type: Condition
+        self.choice = intern(choice) if type(choice) is str else choice # Shared by the edges of a menu or screen
 
     def __eq__(self, other):
         # type: (Edge) -> bool
@@ -26,13 +34,22 @@ class Edge:
             return False
         return True
 
+    def __ne__(self, other):
+        # type: (Edge) -> bool
+        return not self == other
+
+    def __hash__(self):
+        # type: () -> int
+        # Must be consistent with __eq__, do not modify an edge stored in a set
+        return hash((self.start, self.end, self.condition, self.choice))
+
     def __repr__(self):
         # type: () -> str
         label = ""
         if self.choice is not None:
             label = repr(self.choice)
-        if self.condition != "True":
-            label += " if " + self.condition
+        if self.condition is not TRUE:
+            label += " if " + str(self.condition)
         elif self.choice is None and len(self.start.children) > 1:
             label = "else"
         label = label.strip()
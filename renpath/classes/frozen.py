@@ -0,0 +1,133 @@
+from array import array
+from collections import deque
+from ..typing import Dict, Iterator, List, Optional, Tuple
+
+from .ids import StringTable, numbered
+
+def __mock_imports(): # type: ignore
+    # Mock imports for the linter
+    global Graph, Node
+    from graph import Graph
+    from node import Node
+
+
+
+class FrozenGraph(object):
+    """Read-only view of a graph in compressed sparse row form
+
+    Nodes and edges are numbered by their position in `Graph.nodes` and
+    `Graph.edges`. The outgoing edges of node i are
+    `out_edges[out_offsets[i]:out_offsets[i + 1]]`, in the order of its
+    children (`in_*` for its parents). Every array is an `array('i')`, which
+    numpy can use without copying (`numpy.frombuffer(a, dtype=numpy.intc)`).
+
+    Conditions, choices and source files are indices in `strings`, -1 for
+    none. Use `Graph.freeze` to create one.
+    """
+
+    def __init__(self, graph):
+        # type: (Graph) -> None
+        nodes, edges, node_ids, edge_ids = numbered(graph)
+        table = StringTable(-1)
+        string_id = table.id
+
+        self.nodes = tuple(nodes) # To go back to the objects
+        self.strings = table.strings # type: List[str]
+
+        self.edge_start = array("i", (node_ids[edge.start] for edge in edges))
+        self.edge_end = array("i", (node_ids[edge.end] for edge in edges))
+        self.edge_condition = array("i", (string_id(edge.condition) for edge in edges))
+        self.edge_choice = array("i", (string_id(edge.choice) for edge in edges))
+
+        self.node_file = array("i", (string_id(node.origin.filename if node.origin is not None else None) for node in nodes))
+        self.node_line = array("i", (node.origin.linenumber if node.origin is not None else -1 for node in nodes))
+
+        self.out_offsets, self.out_edges = _rows(edge_ids, (node.children for node in nodes))
+        self.in_offsets, self.in_edges = _rows(edge_ids, (node.parents for node in nodes))
+
+    def __len__(self):
+        # type: () -> int
+        return len(self.nodes)
+
+    @property
+    def edge_count(self):
+        # type: () -> int
+        return len(self.edge_start)
+
+    def out_degree(self, node):
+        # type: (int) -> int
+        return self.out_offsets[node + 1] - self.out_offsets[node]
+
+    def in_degree(self, node):
+        # type: (int) -> int
+        return self.in_offsets[node + 1] - self.in_offsets[node]
+
+    def successors(self, node):
+        # type: (int) -> Iterator[int]
+        edge_end = self.edge_end
+        for i in range(self.out_offsets[node], self.out_offsets[node + 1]):
+            yield edge_end[self.out_edges[i]]
+
+    def predecessors(self, node):
+        # type: (int) -> Iterator[int]
+        edge_start = self.edge_start
+        for i in range(self.in_offsets[node], self.in_offsets[node + 1]):
+            yield edge_start[self.in_edges[i]]
+
+    def location(self, node):
+        # type: (int) -> Optional[Tuple[str, int]]
+        if self.node_file[node] < 0:
+            return None
+        return self.strings[self.node_file[node]], self.node_line[node]
+
+    def condition(self, edge):
+        # type: (int) -> str
+        return self.strings[self.edge_condition[edge]]
+
+    def choice(self, edge):
+        # type: (int) -> Optional[str]
+        if self.edge_choice[edge] < 0:
+            return None
+        return self.strings[self.edge_choice[edge]]
+
+    def bfs(self, source):
+        # type: (int) -> array
+        """Distance (in edges) of every node from the source, -1 when unreachable"""
+        distances = array("i", [-1]) * len(self.nodes)
+        distances[source] = 0
+        out_offsets, out_edges, edge_end = self.out_offsets, self.out_edges, self.edge_end
+        todo = deque([source])
+        while todo:
+            node = todo.popleft()
+            distance = distances[node] + 1
+            for i in range(out_offsets[node], out_offsets[node + 1]):
+                end = edge_end[out_edges[i]]
+                if distances[end] < 0:
+                    distances[end] = distance
+                    todo.append(end)
+        return distances
+
+    def reachable(self, source):
+        # type: (int) -> bytearray
+        """1 for every node reachable from the source (itself included), 0 otherwise"""
+        reached = bytearray(len(self.nodes))
+        reached[source] = 1
+        out_offsets, out_edges, edge_end = self.out_offsets, self.out_edges, self.edge_end
+        todo = [source]
+        while todo:
+            node = todo.pop()
+            for i in range(out_offsets[node], out_offsets[node + 1]):
+                end = edge_end[out_edges[i]]
+                if not reached[end]:
+                    reached[end] = 1
+                    todo.append(end)
+        return reached
+
+def _rows(edge_ids, adjacency):
+    # type: (Dict[object, int], Iterator[Iterator[object]]) -> Tuple[array, array]
+    offsets = array("i", [0])
+    ids = array("i")
+    for edges in adjacency:
+        ids.extend(edge_ids[edge] for edge in edges)
+        offsets.append(len(ids))
+    return offsets, ids
@@ -1,34 +1,169 @@
+import json
+from collections import OrderedDict
 from renpath import renpy
-from ..typing import Dict, List, Union
+from ..conditions import TRUE, Condition
+from ..metrics import Metrics
+from ..screens import NO_SCREENS
+from ..typing import IO, Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
 
+from . import binary, dot
 from .edge import Edge
+from .frozen import FrozenGraph
+from .ids import StringTable, callers as _callers, numbered
 from .node import Node
+from .ordered_set import OrderedSet
 
 
 
-class Graph:
+def _node_key(node):
+    # type: (Union[Node, renpy.ast.Node, None]) -> Union[renpy.ast.Node, None]
+    if isinstance(node, Node):
+        return node.origin
+    return node
+
+def _edge_key(edge):
+    # type: (Edge) -> Tuple[Node, Node, Condition, Optional[str]]
+    return (edge.start, edge.end, edge.condition, edge.choice)
+
+def _location(rpynode):
+    # type: (renpy.ast.Node) -> str
+    return rpynode.filename + "#" + str(rpynode.linenumber)
+
+_located = None # type: Optional[Tuple[List[renpy.ast.Node], int, Dict[str, renpy.ast.Node]]]
+
+def _location_index():
+    # type: () -> Dict[str, renpy.ast.Node]
+    """Statements by location, built once and reused while the script does not change"""
+    global _located
+    statements = renpy.game.script.all_stmts # type: ignore
+    if _located is None or _located[0] is not statements or _located[1] != len(statements):
+        index = {} # type: Dict[str, renpy.ast.Node]
+        for rpynode in statements:
+            if isinstance(rpynode, renpy.ast.Pass):
+                continue
+            if _location(rpynode) not in index:
+                index[_location(rpynode)] = rpynode
+        _located = (statements, len(statements), index)
+    return _located[2]
+
+def _write_array(write, items):
+    # type: (Callable[[str], Any], Iterable[Any]) -> None
+    write("[")
+    for i, item in enumerate(items):
+        if i:
+            write(", ")
+        write(json.dumps(item))
+    write("]")
+
+def _write_full(write, nodes, edges, node_ids, edge_ids):
+    # type: (Callable[[str], Any], List[Node], List[Edge], Dict[Node, int], Dict[Edge, int]) -> None
+    write("{\"nodes\": ")
+    _write_array(write, (
+        {
+            "location": _location(node.origin),
+            "parents": [edge_ids[parent] for parent in node.parents],
+            "children": [edge_ids[child] for child in node.children],
+            "callers": _callers(node, node_ids),
+            "screens": {} # TODO: Serialize screens
+        }
+        for node in nodes
+    ))
+    write(", \"edges\": ")
+    _write_array(write, (
+        {
+            "start": node_ids[edge.start],
+            "condition": str(edge.condition),
+            "choice": edge.choice,
+            "end": node_ids[edge.end]
+        }
+        for edge in edges
+    ))
+    write("}")
+
+def _write_compact(write, nodes, edges, node_ids, edge_ids):
+    # type: (Callable[[str], Any], List[Node], List[Edge], Dict[Node, int], Dict[Edge, int]) -> None
+    strings = StringTable()
+    write("{\"format\": \"compact\", \"nodes\": {\"location\": ")
+    _write_array(write, (_location(node.origin) for node in nodes))
+    write(", \"parents\": ")
+    _write_array(write, ([edge_ids[parent] for parent in node.parents] for node in nodes))
+    write(", \"children\": ")
+    _write_array(write, ([edge_ids[child] for child in node.children] for node in nodes))
+    write(", \"callers\": ")
+    _write_array(write, (_callers(node, node_ids) for node in nodes))
+    write("}, \"edges\": {\"start\": ")
+    _write_array(write, (node_ids[edge.start] for edge in edges))
+    write(", \"end\": ")
+    _write_array(write, (node_ids[edge.end] for edge in edges))
+    write(", \"condition\": ")
+    _write_array(write, (strings.id(edge.condition) for edge in edges))
+    write(", \"choice\": ")
+    _write_array(write, (strings.id(edge.choice) for edge in edges))
+    write("}, \"strings\": ")
+    _write_array(write, strings.strings)
+    write("}")
+
+def _read_full(data):
+    # type: (Dict[str, Any]) -> Tuple[List[str], List[List[int]], List[List[int]], List[Tuple[int, int, str, Optional[str]]]]
+    raw_nodes = data["nodes"]
+    locations = [raw_node["location"] for raw_node in raw_nodes]
+    parents = [raw_node["parents"] for raw_node in raw_nodes]
+    children = [raw_node["children"] for raw_node in raw_nodes]
+    edges = [(raw_edge["start"], raw_edge["end"], raw_edge["condition"], raw_edge["choice"]) for raw_edge in data["edges"]]
+    return locations, parents, children, edges
+
+def _read_compact(data):
+    # type: (Dict[str, Any]) -> Tuple[List[str], List[List[int]], List[List[int]], List[Tuple[int, int, str, Optional[str]]]]
+    strings = data["strings"]
+    raw_nodes = data["nodes"]
+    raw_edges = data["edges"]
+    edges = [
+        (start, end, strings[condition], strings[choice] if choice is not None else None)
+        for start, end, condition, choice in zip(raw_edges["start"], raw_edges["end"], raw_edges["condition"], raw_edges["choice"])
+    ]
+    return raw_nodes["location"], raw_nodes["parents"], raw_nodes["children"], edges
+
+class Graph(object):
     def __init__(self):
         # type: () -> None
-        self.nodes = [] # type: List[Node]
-        self.edges = [] # type: List[Edge]
+        # Indexed by origin (nodes) and by (start, end, condition, choice) (edges)
+        # Insertion order is kept for a deterministic output
+        self._nodes = OrderedDict() # type: Dict[renpy.ast.Node, Node]
+        self._edges = OrderedDict() # type: Dict[Tuple[Node, Node, Condition, Optional[str]], Edge]
+        self.stats = {} # type: Dict[str, Any]
+        self.metrics = Metrics()
+        self.frontier = OrderedSet() # type: OrderedSet[Node] # Not expanded because a budget ran out
+
+    @property
+    def nodes(self):
+        # type: () -> List[Node]
+        # Read-only view, use add_node and remove_node to make changes
+        return list(self._nodes.values())
+
+    @property
+    def node_count(self):
+        # type: () -> int
+        return len(self._nodes)
+
+    @property
+    def edges(self):
+        # type: () -> List[Edge]
+        # Read-only view, use add_edge and remove_edge to make changes
+        return list(self._edges.values())
 
     def get_node(self, node):
         # type: (Union[Node, renpy.ast.Node, None]) -> Union[Node, None]
-        for node2 in self.nodes:
-            if node == node2:
-                return node2
-        return None
+        return self._nodes.get(_node_key(node))
 
     def get_edge(self, edge):
         # type: (Edge) -> Union[Edge, None]
-        for edge2 in self.edges:
-            if edge == edge2:
-                return edge2
-        return None
+        if not isinstance(edge, Edge):
+            return None
+        return self._edges.get(_edge_key(edge))
 
     def has_node(self, node):
         # type: (Union[Node, renpy.ast.Node]) -> bool
-        return self.get_node(node) is not None
+        return _node_key(node) in self._nodes
 
     def has_edge(self, edge):
         # type: (Edge) -> bool
@@ -40,126 +175,90 @@ class Graph:
             pass # TODO
         if not isinstance(node, Node):
             return
-        if not self.has_node(node):
-            self.nodes.append(node)
+        key = _node_key(node)
+        if key not in self._nodes:
+            self._nodes[key] = node
 
     def add_edge(self, edge):
         # type: (Edge) -> None
         if not isinstance(edge, Edge):
             return
-        if not self.has_edge(edge):
-            self.edges.append(edge)
+        key = _edge_key(edge)
+        if key not in self._edges:
+            self._edges[key] = edge
+
+    def remove_node(self, node):
+        # type: (Node) -> None
+        # Does not remove the edges connected to the node
+        self._nodes.pop(_node_key(node), None)
+
+    def remove_edge(self, edge):
+        # type: (Edge) -> None
+        # Does not update the parents and children of the edge's nodes
+        self._edges.pop(_edge_key(edge), None)
+
+    def freeze(self):
+        # type: () -> FrozenGraph
+        # For analyses once the graph is done: later changes are not reflected
+        return FrozenGraph(self)
+
+    def dump(self, stream):
+        # type: (IO[bytes]) -> None
+        # Binary format, read in place with binary.MappedGraph
+        binary.dump(self, stream)
 
-    def vizualize(self):
+    def vizualize(self, output="path.dot", partition=None, separate=False):
+        # type: (Union[str, IO[str]], Optional[str], bool) -> List[str]
         # Since it is very unlikely that pygraphviz will install successfully,
-        # we generate the .dot file by hand.
-        lines = ["digraph path {"]
-
-        for i, node in enumerate(self.nodes):
-            label = repr(node).replace("\"", "\\\"").replace("\n", "\\n")
-            # TODO: Better label
-            lines.append("\t{} [label=\"{}\"]".format(i, label))
-
-        for edge in self.edges:
-            try:
-                i = self.nodes.index(edge.start)
-                j = self.nodes.index(edge.end)
-            except IndexError:
-                continue
-            label = ""
-            if edge.choice is not None:
-                label = edge.choice
-            if edge.condition != "True":
-                label += "\nif " + edge.condition
-            elif edge.choice is None and len(edge.start.children) > 1:
-                label = "else"
-            label = label.strip().replace('"', '\\"').replace("\n", "\\n")
-            if label:
-                lines.append("\t{} -> {} [label=\"{}\"]".format(i, j, label))
-            else:
-                lines.append("\t{} -> {}".format(i, j))
-
-        lines.append("}")
-        with open("path.dot", "w") as f:
-            f.write("\n".join(lines))
-    
-    def serialize(self):
-        # type: () -> str
-        import json
-
-        nodes = []
-        for node in self.nodes:
-            location = node.origin.filename + '#' + str(node.origin.linenumber)
-            parents = [self.edges.index(parent) for parent in node.parents]
-            children = [self.edges.index(child) for child in node.children]
-            callers = [self.nodes.index(caller) if caller is not None else None for caller in node.callers if caller in self.nodes or caller is None]
-            data = {
-                "location": location,
-                "parents": parents,
-                "children": children,
-                "callers": callers,
-                "screens": {} # TODO: Serialize screens
-            }
-            nodes.append(data)
-
-        edges = []
-        for edge in self.edges:
-            start = self.nodes.index(edge.start)
-            end = self.nodes.index(edge.end)
-            data = {
-                "start": start,
-                "condition": edge.condition,
-                "choice": edge.choice,
-                "end": end
-            }
-            edges.append(data)
-
-        serial = json.dumps({
-            "nodes": nodes,
-            "edges": edges
-        })
-        return serial
-    
+        # we generate the .dot file by hand. See dot.write_dot for the options.
+        return dot.write_dot(self, output, partition, separate)
+
+    def serialize(self, stream=None, compact=False):
+        # type: (Optional[IO[str]], bool) -> Optional[str]
+        # stream: where to write the serial, returned as a string when None
+        # compact: stores the edges as columns and their conditions and choices in a string table
+        chunks = [] # type: List[str]
+        write = stream.write if stream is not None else chunks.append # type: Callable[[str], Any]
+
+        # Ids are the positions in the views, assigned once
+        nodes, edges, node_ids, edge_ids = numbered(self)
+
+        if compact:
+            _write_compact(write, nodes, edges, node_ids, edge_ids)
+        else:
+            _write_full(write, nodes, edges, node_ids, edge_ids)
+
+        if stream is None:
+            return "".join(chunks)
+        return None
+
     @staticmethod
     def deserialize(serial):
-        # type: (str) -> Graph
-        import json
-        from ..node_generation import _new_node # Local to prevent circular imports
+        # type: (Union[str, IO[str]]) -> Graph
+        if hasattr(serial, "read"):
+            data = json.load(serial) # type: ignore
+        else:
+            data = json.loads(serial) # type: ignore
+        if data.get("format") == "compact":
+            locations, parents, children, raw_edges = _read_compact(data)
+        else:
+            locations, parents, children, raw_edges = _read_full(data)
 
-        data = json.loads(serial)
+        return Graph._build(locations, parents, children, raw_edges)
+
+    @staticmethod
+    def _build(locations, parents, children, raw_edges):
+        # type: (Iterable[str], Iterable[Iterable[int]], Iterable[Iterable[int]], Iterable[Tuple[int, int, str, Optional[str]]]) -> Graph
+        # Everything is resolved by id, the serial has no duplicates to check for
+        from ..node_generation import _new_node # Local to prevent circular imports
         graph = Graph()
+        located = _location_index()
+        nodes = [_new_node(graph, located.get(location), [], NO_SCREENS) for location in locations] # TODO: Deserialize screens
+        edges = [Edge(nodes[start], nodes[end], condition, choice) for start, end, condition, choice in raw_edges]
+        graph._edges = OrderedDict((_edge_key(edge), edge) for edge in edges)
 
-        located = {} # type: Dict[str, renpy.ast.Node]
-        for raw_node in data["nodes"]:
-            located[raw_node["location"]] = None # type: ignore
-        for rpynode in renpy.game.script.all_stmts: # type: ignore
-            location = rpynode.filename + "#" + str(rpynode.linenumber)
-            if isinstance(rpynode, renpy.ast.Pass):
-                continue
-            if location in located and located[location] is None:
-                located[location] = rpynode
-
-        for raw_node in data["nodes"]:
-            rpynode = located[raw_node["location"]]
-            node = _new_node(graph, rpynode, [], {}) # TODO: Deserialize screens
-            graph.add_node(node)
-        
-        for raw_edge in data["edges"]:
-            start = graph.nodes[raw_edge["start"]]
-            end = graph.nodes[raw_edge["end"]]
-            edge = Edge(start, end, raw_edge["condition"], raw_edge["choice"])
-            graph.add_edge(edge)
-        
-        for raw_node in data["nodes"]:
-            rpynode = located[raw_node["location"]]
-            node = graph.get_node(rpynode)
-            if node is None:
-                continue
-            for i in raw_node["parents"]:
-                parent = graph.edges[i]
-                node.parents.append(parent)
-            for i in raw_node["children"]:
-                child = graph.edges[i]
-                node.children.append(child)
+        for node, node_parents, node_children in zip(nodes, parents, children):
+            node.parents.update(edges[i] for i in node_parents)
+            node.children.update(edges[i] for i in node_children)
 
         return graph
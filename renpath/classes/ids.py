@@ -0,0 +1,49 @@
+from ..typing import Any, Dict, List, Optional, Tuple
+
+def __mock_imports(): # type: ignore
+    # Mock imports for the linter
+    global Edge, Graph, Node
+    from edge import Edge
+    from graph import Graph
+    from node import Node
+
+
+
+def numbered(graph):
+    # type: (Graph) -> Tuple[List[Node], List[Edge], Dict[Node, int], Dict[Edge, int]]
+    """Nodes and edges with their ids, the positions in `Graph.nodes` and `Graph.edges`"""
+    nodes = graph.nodes
+    edges = graph.edges
+    node_ids = dict((node, i) for i, node in enumerate(nodes)) # type: Dict[Node, int]
+    edge_ids = dict((edge, i) for i, edge in enumerate(edges)) # type: Dict[Edge, int]
+    return nodes, edges, node_ids, edge_ids
+
+def callers(node, node_ids):
+    # type: (Node, Dict[Node, int]) -> List[Optional[int]]
+    # Summaries and callers outside of the graph are not kept
+    return [node_ids[caller] if caller is not None else None for caller in node.callers if caller is None or caller in node_ids]
+
+class StringTable(object):
+    """Strings stored once each, by id
+
+    Values (conditions, choices, filenames) are rendered with `str` the
+    first time only: conditions are interned, no need to render them twice.
+    """
+
+    def __init__(self, none=None):
+        # type: (Optional[int]) -> None
+        self.none = none # Id of None
+        self.strings = [] # type: List[str]
+        self._ids = {} # type: Dict[Any, int]
+
+    def id(self, value):
+        # type: (Any) -> Optional[int]
+        if value is None:
+            return self.none
+        if value not in self._ids:
+            text = str(value)
+            if text not in self._ids:
+                self._ids[text] = len(self.strings)
+                self.strings.append(text)
+            self._ids[value] = self._ids[text]
+        return self._ids[value]
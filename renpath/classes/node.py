@@ -1,31 +1,37 @@
 from renpath import renpy
-from ..typing import Dict, Iterator, List, Optional
+from ..typing import Dict, Iterable, Iterator, List, Optional, Union
 
 from .edge import Edge
+from .ordered_set import OrderedSet
+from ..screens import ScreenState, screen_state
+from ..utility import source_line
 
 def __mock_imports(): # type: ignore
     # Mock imports for the linter
-    global Call, Graph, NextGetter, Screen
+    global Call, Graph, NextGetter, Propagator, Screen
     from nodes import Call
     from graph import Graph
     from ..node_generation import NextGetter
+    from ..propagation import Propagator
     from ..screens import Screen
 
 
 
 class Node(object):
+    __slots__ = ("origin", "parents", "children", "callers", "screens")
+
     def __init__(self, origin, parents, callers, screens):
-        # type: (renpy.ast.Node, List[Edge], List[Optional[Call]], Dict[str, Screen]) -> None
+        # type: (renpy.ast.Node, Iterable[Edge], Iterable[Optional[Call]], Union[ScreenState, Dict[str, Screen]]) -> None
         self.origin = origin
-        self.parents = parents
-        self.children = [] # type: List[Edge]
-        self.callers = callers
-        self.screens = screens
+        self.parents = OrderedSet(parents) # type: OrderedSet[Edge]
+        self.children = OrderedSet() # type: OrderedSet[Edge]
+        self.callers = OrderedSet(callers) # type: OrderedSet[Optional[Call]]
+        self.screens = screen_state(screens) # type: ScreenState # Shared, replaced (never modified) when the screens change
 
     def generate_children(self, graph, next_getter):
         # type: (Graph, NextGetter) -> List[Edge]
         # Warning: Does not add the child not the edge to the graph
-        from nodes import INSTANT, UserStatement # Local to prevent circular imports
+        from .nodes import INSTANT, UserStatement # Local to prevent circular imports
         from ..node_generation import _new_node # Local to prevent circular imports
         if self.origin is None:
             return []
@@ -36,44 +42,27 @@ class Node(object):
         if not isinstance(self, INSTANT):
             for screen in self.screens.values():
                 edges += screen.get_connections(self, graph, next_getter)
-        child = graph.get_node(next_) or _new_node(graph, next_, [], dict(self.screens))
+        child = graph.get_node(next_) or _new_node(graph, next_, [], self.screens)
         edge = Edge(self, child)
         edge = graph.get_edge(edge) or edge
         edges.append(edge)
         return edges
 
-    def propagate(self, graph, next_getter):
-        # type: (Graph, NextGetter) -> Iterator[Edge]
-        from .nodes import Call # Local to prevent circular imports
-        from .nodes import Return
-        todo = [self]
-        while todo:
-            current = todo.pop(0)
-            if isinstance(current, Return):
-                for edge in current.propagate(graph, next_getter):
-                    yield edge
-                # TODO: Merge here to prevent stackoverflow ?
-                continue
-            for edge in current.children:
-                added = False
-                for caller in current.callers:
-                    if isinstance(current, Call):
-                        if current in current.unwarp_calls():
-                            # Already looping
-                            continue
-                        caller = current
-                    if caller not in edge.end.callers:
-                        edge.end.callers.append(caller)
-                        added = True
-                if added:
-                    todo.append(edge.end)
-                    # for next_edge in edge.end.propagate(graph, next_getter):
-                    #     yield next_edge
+    def propagate(self, propagator, callers):
+        # type: (Propagator, Iterable[Optional[Call]]) -> Iterator[Edge]
+        # Pushes the newly found callers to the children, yields any new edge
+        for edge in self.children:
+            self.propagate_edge(propagator, edge, callers)
+        return iter(())
+
+    def propagate_edge(self, propagator, edge, callers):
+        # type: (Propagator, Edge, Iterable[Optional[Call]]) -> None
+        propagator.add_callers(edge.end, callers)
 
     def unwarp_calls(self):
-        # type: () -> List[Call]
+        # type: () -> OrderedSet[Call]
         todo = [self]
-        done = []
+        done = OrderedSet() # type: OrderedSet[Call]
         while todo:
             current = todo.pop()
             if current is None:
@@ -82,7 +71,7 @@ class Node(object):
                 if caller is None:
                     continue
                 if caller not in done:
-                    done.append(caller)
+                    done.add(caller)
                     todo.append(caller)
         return done
 
@@ -94,6 +83,10 @@ class Node(object):
             return self.origin == other
         return False
 
+    def __ne__(self, other):
+        # type: (Union[Node, renpy.ast.Node]) -> bool
+        return not self == other
+
     def __hash__(self):
         # type: () -> int
         return hash(self.origin)
@@ -105,12 +98,8 @@ class Node(object):
         try:
             code = self.origin.get_code().strip()
         except:
-            try:
-                fn = self.origin.filename.replace(".rpyc", ".rpy")
-                with open(fn, "r") as f:
-                    code = f.readlines()[self.origin.linenumber - 1].strip()
-            except:
-                code = self.origin
+            line = source_line(self.origin.filename, self.origin.linenumber)
+            code = line.strip() if line is not None else self.origin
         return "{} ({}): {} ({}, {})".format(
             self.__class__.__name__,
             self.origin.__class__.__name__,
@@ -1,23 +1,25 @@
 from renpath import renpy
 from .node import Node
+from .ordered_set import OrderedSet
 from ..utility import lookup_or_none
-from ..screens import Screen, get_screen
-from ..typing import Dict, Iterator, List, Optional
+from ..screens import Screen, ScreenState, get_screen
+from ..typing import Dict, Iterable, Iterator, List, Optional, Union
 
 def __mock_imports(): # type: ignore
     # Mock imports for the linter
-    global Edge, Graph, NextGetter
+    global Edge, Graph, NextGetter, Propagator, Summary
     from edge import Edge
     from graph import Graph
     from ..node_generation import NextGetter
+    from ..propagation import Propagator, Summary
 
 
 
 class Label(Node):
-    origin = None # type: renpy.ast.Label # type: ignore
+    __slots__ = () # origin: renpy.ast.Label
 
 class Jump(Node):
-    origin = None # type: renpy.ast.Jump # type: ignore
+    __slots__ = () # origin: renpy.ast.Jump
 
     def generate_children(self, graph, next_getter):
         # type: (Graph, NextGetter) -> List[Edge]
@@ -27,13 +29,13 @@ class Jump(Node):
         next_ = next_getter(target, False)
         if next_ is None:
             return []
-        child = graph.get_node(next_) or _new_node(graph, next_, [], dict(self.screens))
+        child = graph.get_node(next_) or _new_node(graph, next_, [], self.screens)
         edge = Edge(self, child)
         edge = graph.get_edge(edge) or edge
         return [edge]
 
 class Call(Node):
-    origin = None # type: renpy.ast.Call # type: ignore
+    __slots__ = () # origin: renpy.ast.Call
 
     def generate_children(self, graph, next_getter):
         # type: (Graph, NextGetter) -> List[Edge]
@@ -43,48 +45,73 @@ class Call(Node):
         next_ = next_getter(label, False)
         if next_ is None:
             return []
-        child = graph.get_node(next_) or _new_node(graph, next_, [], dict(self.screens))
+        child = graph.get_node(next_) or _new_node(graph, next_, [], self.screens)
         edge = Edge(self, child)
         edge = graph.get_edge(edge) or edge
         return [edge]
 
+    def propagate(self, propagator, callers):
+        # type: (Propagator, Iterable[Optional[Call]]) -> Iterator[Edge]
+        for edge in super(Call, self).propagate(propagator, callers):
+            yield edge
+        # The returns already reached must also go back to the new callers
+        for return_ in list(propagator.returns.get(propagator.context(self), ())):
+            for edge in return_.return_to(propagator, self, callers):
+                yield edge
+
+    def propagate_edge(self, propagator, edge, callers):
+        # type: (Propagator, Edge, Iterable[Optional[Call]]) -> None
+        context = propagator.context(self)
+        if context is self and self in propagator.unwarp_calls(self):
+            return # Already looping
+        propagator.add_callers(edge.end, [context])
+
 class Return(Node):
-    origin = None # type: renpy.ast.Return # type: ignore
+    __slots__ = () # origin: renpy.ast.Return
 
     def generate_children(self, graph, next_getter):
         # type: (Graph, NextGetter) -> List[Edge]
         return [] # Done during propagation
 
-    def propagate(self, graph, next_getter):
-        # type: (Graph, NextGetter) -> Iterator[Edge]
-        from ..node_generation import _new_node # Local to prevent circular imports
-        from .edge import Edge # Local to prevent circular imports
-        for caller in self.callers:
+    def propagate(self, propagator, callers):
+        # type: (Propagator, Iterable[Optional[Call]]) -> Iterator[Edge]
+        from ..propagation import Summary # Local to prevent circular imports
+        for caller in callers:
             if caller is None:
                 continue # TODO: To main menu
-            for parent in caller.callers:
-                label = "" if parent is None else parent.origin.label
-
-                found = None
-                for edge in self.children:
-                    if edge.condition == label:
-                        found = edge
-                        break
-                next_ = next_getter(caller.origin.next) # type: ignore
-                if found is None and next_ is not None:
-                    child = graph.get_node(next_) or _new_node(graph, next_, [], dict(self.screens))
-                    edge = Edge(self, child, choice=label)
-                    edge = graph.get_edge(edge) or edge
+            propagator.returns.setdefault(caller, OrderedSet()).add(self)
+            calls = list(caller.calls) if isinstance(caller, Summary) else [caller]
+            for call in calls:
+                for edge in self.return_to(propagator, call, list(call.callers)):
                     yield edge
-                    found = edge
 
-                if found is not None and parent not in found.end.callers:
-                    found.end.callers.append(parent)
-                    for edge in found.end.propagate(graph, next_getter):
-                        yield edge
+    def propagate_edge(self, propagator, edge, callers):
+        # type: (Propagator, Edge, Iterable[Optional[Call]]) -> None
+        pass # Returning edges are only followed by the callers they return to
+
+    def return_to(self, propagator, caller, parents):
+        # type: (Propagator, Call, Iterable[Union[Call, Summary, None]]) -> Iterator[Edge]
+        from ..node_generation import _new_node # Local to prevent circular imports
+        from ..propagation import Summary # Local to prevent circular imports
+        from .edge import Edge # Local to prevent circular imports
+        graph = propagator.graph
+        next_ = propagator.next_getter(caller.origin.next) # type: ignore
+        if next_ is None:
+            return
+        for parent in parents:
+            if parent is None:
+                label = ""
+            elif isinstance(parent, Summary):
+                label = parent.label
+            else:
+                label = parent.origin.label
+            child = graph.get_node(next_) or _new_node(graph, next_, [], self.screens)
+            edge = Edge(self, child, choice=label)
+            yield graph.get_edge(edge) or edge
+            propagator.add_callers(child, [parent])
 
 class Menu(Node):
-    origin = None # type: renpy.ast.Menu # type: ignore
+    __slots__ = () # origin: renpy.ast.Menu
 
     def generate_children(self, graph, next_getter):
         # type: (Graph, NextGetter) -> List[Edge]
@@ -97,14 +124,14 @@ class Menu(Node):
             next_ = next_getter(block[0], False)
             if next_ is None:
                 return []
-            child = graph.get_node(next_) or _new_node(graph, next_, [], dict(self.screens))
+            child = graph.get_node(next_) or _new_node(graph, next_, [], self.screens)
             edge = Edge(self, child, condition, text)
             edge = graph.get_edge(edge) or edge
             edges.append(edge)
         return edges
 
 class If(Node):
-    origin = None # type: renpy.ast.If # type: ignore
+    __slots__ = () # origin: renpy.ast.If
 
     def generate_children(self, graph, next_getter):
         # type: (Graph, NextGetter) -> List[Edge]
@@ -119,14 +146,14 @@ class If(Node):
             next_ = next_getter(block[0], False)
             if next_ is None:
                 return []
-            child = graph.get_node(next_) or _new_node(graph, next_, [], dict(self.screens))
+            child = graph.get_node(next_) or _new_node(graph, next_, [], self.screens)
             edge = Edge(self, child, condition)
             edge = graph.get_edge(edge) or edge
             edges.append(edge)
         return edges
 
 class Python(Node):
-    origin = None # type: renpy.ast.Python # type: ignore
+    __slots__ = () # origin: renpy.ast.Python
 
     @property
     def is_mainmenu(self):
@@ -146,10 +173,10 @@ class Python(Node):
         return super(Python, self).__repr__()
 
 class UserStatement(Node):
-    origin = None # type: renpy.ast.Python # type: ignore
+    __slots__ = () # origin: renpy.ast.Python
 
     def __init__(self, origin, parents, callers, screens):
-        # type: (renpy.ast.Node, List[Edge], List[Optional[Call]], Dict[str, Screen]) -> None
+        # type: (renpy.ast.Node, Iterable[Edge], Iterable[Optional[Call]], Union[ScreenState, Dict[str, Screen]]) -> None
         super(UserStatement, self).__init__(origin, parents, callers, screens)
 
     def keep(self):
@@ -161,12 +188,10 @@ class UserStatement(Node):
         if self.origin.get_name() == "show screen":
             name = self.origin.parsed[1]["name"]
             if name not in self.screens:
-                screen = get_screen(name)
-                self.screens[name] = screen
+                self.screens = self.screens.show(name, get_screen(name))
         if self.origin.get_name() == "hide screen":
             name = self.origin.parsed[1]["name"]
-            if name in self.screens:
-                self.screens.pop(name)
+            self.screens = self.screens.hide(name)
         if self.origin.get_name() == "call screen":
             name = self.origin.parsed[1]["name"]
             screen = get_screen(name)
@@ -0,0 +1,64 @@
+import sys
+from collections import OrderedDict
+from ..typing import Any, Iterable, Iterator
+
+# Dictionaries keep the insertion order since Python 3.7 and are much smaller
+_Dict = dict if sys.version_info >= (3, 7) else OrderedDict
+
+
+
+class OrderedSet(object):
+    """Set keeping the insertion order of its items
+
+    The storage is only allocated once an item is added: most nodes have
+    no parents, children or callers at some point.
+    """
+    __slots__ = ("_items",)
+
+    def __init__(self, items=()):
+        # type: (Iterable[Any]) -> None
+        self._items = None # type: Any
+        self.update(items)
+
+    def add(self, item):
+        # type: (Any) -> None
+        if self._items is None:
+            self._items = _Dict()
+        self._items[item] = None
+
+    def update(self, items):
+        # type: (Iterable[Any]) -> None
+        for item in items:
+            self.add(item)
+
+    def remove(self, item):
+        # type: (Any) -> None
+        if self._items is None:
+            raise KeyError(item)
+        del self._items[item]
+
+    def discard(self, item):
+        # type: (Any) -> None
+        if self._items is not None:
+            self._items.pop(item, None)
+
+    def __contains__(self, item):
+        # type: (Any) -> bool
+        return self._items is not None and item in self._items
+
+    def __iter__(self):
+        # type: () -> Iterator[Any]
+        return iter(self._items or ())
+
+    def __len__(self):
+        # type: () -> int
+        return len(self._items) if self._items is not None else 0
+
+    def __bool__(self):
+        # type: () -> bool
+        return bool(self._items)
+    __nonzero__ = __bool__ # Python 2
+
+    def __repr__(self):
+        # type: () -> str
+        return "{}({})".format(self.__class__.__name__, list(self))
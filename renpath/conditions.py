@@ -0,0 +1,111 @@
+import re
+import weakref
+from .typing import Iterable, Tuple, Union
+
+
+
+_ATOM = "atom"
+_AND = "and"
+_OR = "or"
+
+_SIMPLE = re.compile(r"^[\w.]+$") # Does not need parentheses when nested
+
+
+
+class Condition(object):
+    """Boolean expression on the edges, interned so that equal conditions are the same object
+
+    Use `atom`, `conjunction` and `disjunction` to create them, never the
+    constructor. Sub-expressions are shared between every condition using
+    them, and the text is only built when needed (labels, serialization).
+    """
+    __slots__ = ("kind", "text", "operands", "__weakref__")
+
+    def __init__(self, kind, text, operands):
+        # type: (str, str, Tuple[Condition, ...]) -> None
+        self.kind = kind
+        self.text = text # Only for atoms
+        self.operands = operands # Only for conjunctions and disjunctions
+
+    def _nested(self):
+        # type: () -> str
+        if self.kind == _ATOM and _SIMPLE.match(self.text):
+            return self.text
+        return "(" + str(self) + ")"
+
+    def __str__(self):
+        # type: () -> str
+        if self.kind == _ATOM:
+            return self.text
+        return (" " + self.kind + " ").join(operand._nested() for operand in self.operands)
+
+    def __repr__(self):
+        # type: () -> str
+        return "{}({!r})".format(self.__class__.__name__, str(self))
+
+_interned = weakref.WeakValueDictionary() # type: weakref.WeakValueDictionary[Tuple[str, str, Tuple[Condition, ...]], Condition]
+
+def _intern(kind, text, operands):
+    # type: (str, str, Tuple[Condition, ...]) -> Condition
+    key = (kind, text, operands)
+    condition = _interned.get(key)
+    if condition is None:
+        condition = _interned[key] = Condition(kind, text, operands)
+    return condition
+
+def atom(text):
+    # type: (str) -> Condition
+    text = text.strip()
+    if not text:
+        text = "True"
+    return _intern(_ATOM, text, ())
+
+TRUE = atom("True")
+FALSE = atom("False")
+
+def as_condition(condition):
+    # type: (Union[Condition, str, None]) -> Condition
+    if isinstance(condition, Condition):
+        return condition
+    return atom(condition or "")
+
+def _combine(kind, conditions, neutral, absorbing):
+    # type: (str, Iterable[Condition], Condition, Condition) -> Condition
+    other = _OR if kind == _AND else _AND
+
+    # Flatten, fold constants and remove duplicates (idempotence)
+    operands = []
+    seen = set()
+    for condition in conditions:
+        condition = as_condition(condition)
+        if condition.kind == kind:
+            nested = condition.operands
+        else:
+            nested = (condition,)
+        for operand in nested:
+            if operand is absorbing:
+                return absorbing
+            if operand is neutral or operand in seen:
+                continue
+            seen.add(operand)
+            operands.append(operand)
+
+    # Absorption: a and (a or b) = a, a or (a and b) = a
+    operands = [
+        operand for operand in operands
+        if operand.kind != other or not any(nested in seen for nested in operand.operands)
+    ]
+
+    if not operands:
+        return neutral
+    if len(operands) == 1:
+        return operands[0]
+    return _intern(kind, "", tuple(operands))
+
+def conjunction(conditions):
+    # type: (Iterable[Union[Condition, str]]) -> Condition
+    return _combine(_AND, conditions, TRUE, FALSE)
+
+def disjunction(conditions):
+    # type: (Iterable[Union[Condition, str]]) -> Condition
+    return _combine(_OR, conditions, FALSE, TRUE)
@@ -1,59 +1,136 @@
+from collections import deque
 from renpath import renpy
-from .typing import List, Union
+from .typing import Deque, Dict, Iterable, Optional, Set, Union
 
 from .classes.graph import Graph
-from .node_generation import NextGetter, _new_node
+from .node_generation import NextGetter, _new_node, memoize
+from .propagation import Propagator
+from .screens import NO_SCREENS
+from .utility import perf_counter, unresolved_labels
 
 def __mock_imports(): # type: ignore
     # Mock imports for the linter
-    global Node
+    global Edge, Node
+    from classes.edge import Edge
     from classes.node import Node
 
 
 
-def convert(start_rpynode, end_rpynode, next_getter):
-    # type: (renpy.ast.Node, Union[renpy.ast.Node, None], NextGetter) -> Graph
+def _connect(graph, edge):
+    # type: (Graph, Edge) -> bool
+    """Adds the edge and its end to the graph, returns whether it is new"""
+    new = not graph.has_edge(edge)
+    graph.metrics.count("edges_created" if new else "duplicate_edges", edge.start)
+    graph.add_node(edge.end)
+    graph.add_edge(edge)
+    edge.start.children.add(edge)
+    edge.end.parents.add(edge)
+    return new
 
-    # TODO: Stop at end_node
+def _expand(graph, propagator, nodes, end=None, max_nodes=None, max_depth=None, deadline=None):
+    # type: (Graph, Propagator, Iterable[Node], Optional[renpy.ast.Node], Optional[int], Optional[int], Optional[float]) -> int
+    """Generates the children of the nodes and of the ones they lead to, returns how many were expanded
 
-    graph = Graph()
-    start = _new_node(graph, start_rpynode, [], {})
-    start.callers = [None] # type: ignore # Error on type for no reason, works if empty list and then append None
-    todo = [start] # type: List[Node]
+    end: statement whose node is not expanded
+    max_nodes, max_depth, deadline: budgets (None for no limit), the nodes
+        left unexpanded when one runs out are added to graph.frontier and
+        the reason is stored in graph.stats["stopped"]
+    """
+    todo = deque(nodes) # type: Deque[Node]
+    queued = set(todo) # type: Set[Node]
+    done = set() # type: Set[Node]
+    depths = dict((node, 0) for node in todo) # type: Dict[Node, int] # Only with max_depth
+    expanded = 0
+    stopped = None # type: Optional[str]
+
+    def reach(edge):
+        # type: (Edge) -> None
+        if max_depth is not None:
+            depth = depths[edge.start] + 1
+            if depth < depths.get(edge.end, depth + 1):
+                depths[edge.end] = depth
+                graph.frontier.discard(edge.end) # Closer than thought, to expand after all
+        if edge.end not in queued:
+            # If the edge exists, it may create an infinite loop: scan again
+            todo.append(edge.end)
+            queued.add(edge.end)
 
     while todo:
-        node = todo.pop(0)
+        if max_nodes is not None and graph.node_count >= max_nodes:
+            stopped = "max_nodes"
+            break
+        if deadline is not None and perf_counter() >= deadline:
+            stopped = "time_limit"
+            break
+
+        node = todo.popleft()
+        queued.discard(node)
         if isinstance(node, renpy.ast.Node) and not graph.has_node(node):
             # Should not happen, just in case
-            node = _new_node(graph, node, [], {})
-
-        for edge in node.generate_children(graph, next_getter):
-            child = edge.end
-            if not graph.has_edge(edge) and child not in todo:
-                # If the edge exists, it may create an infinite loop: scan again
-                todo.append(child)
+            node = _new_node(graph, node, [], NO_SCREENS)
+        if end is not None and node.origin is end:
+            graph.stats["end_reached"] = True
+            continue
+        if max_depth is not None and depths[node] >= max_depth:
+            graph.frontier.add(node)
+            continue
+        expanded += 1
+        done.add(node)
+        graph.metrics.count("expanded", node)
 
-            graph.add_node(child)
-            graph.add_edge(edge)
-            if edge not in edge.start.children:
-                edge.start.children.append(edge)
-            if edge not in child.parents:
-                child.parents.append(edge)
+        for edge in graph.metrics.generate_children(node, graph, propagator.next_getter):
+            if _connect(graph, edge):
+                propagator.push(edge)
+                reach(edge)
 
         # Propagate the call stack and get any new returning edges
-        for edge in node.propagate(graph, next_getter):
-            child = edge.end
-            if not graph.has_edge(edge) and child not in todo:
-                # If the edge exists, it may create an infinite loop: scan again
-                todo.append(child)
-
-            graph.add_node(child)
-            graph.add_edge(edge)
-            if edge not in edge.start.children:
-                edge.start.children.append(edge)
-            if edge not in child.parents:
-                child.parents.append(edge)
+        for edge in propagator.run():
+            if _connect(graph, edge):
+                propagator.push(edge)
+                reach(edge)
         
         # TODO: Generate screen connections
 
+    # The call stacks are always propagated to the end of a step, stopping leaves them consistent
+    graph.frontier.update(node for node in todo if node not in done and (end is None or node.origin is not end))
+    if stopped is None and graph.frontier:
+        stopped = "max_depth"
+    if stopped is not None:
+        graph.stats["stopped"] = stopped
+    return expanded
+
+def convert(start_rpynode, end_rpynode, next_getter, max_call_depth=None, max_nodes=None, max_depth=None, time_limit=None):
+    # type: (renpy.ast.Node, Union[renpy.ast.Node, None], NextGetter, Optional[int], Optional[int], Optional[int], Optional[float]) -> Graph
+    # end_rpynode: the path stops there (None to explore everything reachable)
+    # max_call_depth: calls nested deeper share one context per label (None for no limit)
+    # max_nodes: stops expanding once the graph has that many nodes (None for no limit)
+    # max_depth: does not expand the nodes farther than that from the start, in edges (None for no limit)
+    # time_limit: stops expanding after that many seconds (None for no limit)
+    # When a budget runs out, the graph is partial: the nodes left unexpanded are in graph.frontier
+
+    next_getter = memoize(next_getter) # Each run of skipped statements is only walked once
+    graph = Graph()
+    propagator = Propagator(graph, next_getter, max_call_depth)
+    start = _new_node(graph, start_rpynode, [], NO_SCREENS)
+    start.callers.add(None)
+    end = next_getter(end_rpynode, False) # The statement actually kept in the graph
+    deadline = perf_counter() + time_limit if time_limit is not None else None
+    graph.stats["end_reached"] = False
+    graph.stats["stopped"] = None
+    expanded = graph.metrics.phase("Generation", _expand, graph, propagator, [start], end, max_nodes, max_depth, deadline)
+
+    graph.stats["expanded"] = expanded
+    graph.stats["propagation_rounds"] = propagator.rounds
+    graph.stats["merged_contexts"] = propagator.merged
+    graph.stats["next_getter"] = next_getter.stats
+    graph.stats["unresolved_labels"] = unresolved_labels()
+    graph.stats["frontier"] = len(graph.frontier)
+    renpy.display.log.write("Expanded {} nodes".format(expanded))
+    if graph.stats["stopped"] is not None:
+        renpy.display.log.write("Stopped early ({}), {} nodes left unexpanded".format(graph.stats["stopped"], len(graph.frontier)))
+    renpy.display.log.write("Successors: {calls} lookups, {hit_rate:.1%} hits, {skipped} statements skipped".format(**next_getter.stats))
+    if max_call_depth is not None:
+        renpy.display.log.write("Merged {} call contexts".format(propagator.merged))
+    if graph.stats["unresolved_labels"]:
+        renpy.display.log.write("Unresolved labels: " + ", ".join(graph.stats["unresolved_labels"]))
     return graph
@@ -0,0 +1,201 @@
+from renpath import renpy
+from .typing import Dict, List, Optional, Set, Tuple, Union
+
+from .classes.graph import Graph, _location, _location_index
+from .classes.ordered_set import OrderedSet
+from .conversion import _expand, convert
+from .node_generation import NextGetter, _new_node, memoize
+from .propagation import Propagator, Summary
+from .screens import NO_SCREENS
+from .utility import perf_counter, script_digests, unresolved_labels
+
+def __mock_imports(): # type: ignore
+    # Mock imports for the linter
+    global Edge, Node
+    from classes.edge import Edge
+    from classes.node import Node
+
+
+
+def _rebind(graph, changed):
+    # type: (Graph, Set[str]) -> Tuple[Graph, List[Node], List[Node]]
+    """Moves the nodes outside of the changed files to the current statements
+
+    Returns the new graph, without the nodes of the changed files, the nodes
+    that led to them (to generate again) and the nodes whose callers must be
+    propagated again. Callers and returning edges found through the removed
+    nodes may not exist anymore, they are dropped from everything reachable
+    from them.
+    """
+    from .classes.nodes import Return # Local to prevent circular imports
+    located = _location_index()
+    kept = {} # type: Dict[int, renpy.ast.Node] # By id: the hash of a node changes with its origin
+    for node in graph.nodes:
+        if node.origin is None or node.origin.filename in changed:
+            continue
+        rpynode = located.get(_location(node.origin))
+        if rpynode is not None and rpynode.__class__ is node.origin.__class__:
+            kept[id(node)] = rpynode
+
+    # Read everything before changing the origins: the old containers cannot hash them anymore
+    todo = [node for node in graph.nodes if id(node) not in kept]
+    dirty = set() # type: Set[int]
+    while todo:
+        node = todo.pop()
+        for edge in node.children:
+            if id(edge.end) in kept and id(edge.end) not in dirty:
+                dirty.add(id(edge.end))
+                todo.append(edge.end)
+    dropped = set(
+        id(edge) for node in graph.nodes if id(node) in dirty and isinstance(node, Return)
+        for edge in node.children
+    ) # Returning edges, found again through propagation
+
+    def valid(edge):
+        # type: (Edge) -> bool
+        return id(edge.start) in kept and id(edge.end) in kept and id(edge) not in dropped
+
+    nodes = [node for node in graph.nodes if id(node) in kept]
+    edges = [edge for edge in graph.edges if valid(edge)]
+    parents = [[edge for edge in node.parents if valid(edge)] for node in nodes]
+    children = [list(node.children) for node in nodes]
+    callers = [
+        [] if id(node) in dirty else
+        [caller for caller in node.callers if caller is None or isinstance(caller, Summary) or id(caller) in kept]
+        for node in nodes
+    ]
+    summaries = dict((id(caller), caller) for node_callers in callers for caller in node_callers if isinstance(caller, Summary))
+    summary_calls = dict(
+        (key, [call for call in summary.calls if id(call) in kept and id(call) not in dirty])
+        for key, summary in summaries.items()
+    )
+
+    boundary = [node for node, node_children in zip(nodes, children) if any(id(edge.end) not in kept for edge in node_children)]
+    replayed = [
+        node for node, node_children in zip(nodes, children)
+        if id(node) not in dirty and any(id(edge.end) in dirty for edge in node_children)
+    ]
+    for node in nodes:
+        node.origin = kept[id(node)]
+
+    rebound = Graph()
+    for node in nodes:
+        rebound.add_node(node)
+    for edge in edges:
+        rebound.add_edge(edge)
+    for node, node_parents, node_children, node_callers in zip(nodes, parents, children, callers):
+        node.parents = OrderedSet(node_parents)
+        node.children = OrderedSet(edge for edge in node_children if valid(edge))
+        node.callers = OrderedSet(node_callers)
+    for key, summary in summaries.items():
+        summary.calls = OrderedSet(summary_calls[key])
+    return rebound, boundary, boundary + replayed
+
+def _prune(graph, start):
+    # type: (Graph, Node) -> int
+    """Removes the nodes that cannot be reached from the start anymore, returns how many"""
+    reached = set([start])
+    todo = [start]
+    while todo:
+        node = todo.pop()
+        for edge in node.children:
+            if edge.end not in reached:
+                reached.add(edge.end)
+                todo.append(edge.end)
+
+    removed = [node for node in graph.nodes if node not in reached]
+    for node in removed:
+        graph.remove_node(node)
+        for edge in node.parents:
+            edge.start.children.discard(edge)
+            graph.remove_edge(edge)
+        for edge in node.children:
+            edge.end.parents.discard(edge)
+            graph.remove_edge(edge)
+    if removed:
+        for node in graph.nodes:
+            for caller in list(node.callers):
+                if caller is not None and not isinstance(caller, Summary) and not graph.has_node(caller):
+                    node.callers.discard(caller)
+    return len(removed)
+
+def _targets(node):
+    # type: (Node) -> List[str]
+    """Labels the node jumps to, calls or can reach through its screens"""
+    targets = [value for screen in node.screens.values() for _, _, value in screen.template]
+    origin = node.origin
+    if isinstance(origin, renpy.ast.Jump) and not getattr(origin, "expression", False):
+        targets.append(origin.target)
+    elif isinstance(origin, renpy.ast.Call) and not getattr(origin, "expression", False):
+        targets.append(origin.label)
+    return targets
+
+def regenerate(graph, start_rpynode, end_rpynode, next_getter, max_call_depth=None, max_nodes=None, time_limit=None):
+    # type: (Optional[Graph], renpy.ast.Node, Union[renpy.ast.Node, None], NextGetter, Optional[int], Optional[int], Optional[float]) -> Graph
+    """Converts the script again, reusing the graph of a previous conversion
+
+    graph must come from convert or regenerate, before simplification (None
+    to start from scratch). Only the nodes of the script files that changed
+    since are converted again, from the nodes that led to them (or to
+    labels that could not be resolved before). The rest of
+    the graph (nodes, edges and callers) is kept as is. The graph given is
+    reused in place and must not be used afterwards.
+
+    With max_call_depth, the contexts merged may differ from a conversion
+    from scratch since they depend on the order in which calls are reached.
+    max_nodes and time_limit are the budgets of convert, for the whole
+    graph. The nodes left unexpanded by a previous run are expanded again;
+    max_depth is not supported, the depths of the kept nodes are not known.
+    """
+    digests = script_digests()
+    if graph is None or "digests" not in graph.stats:
+        graph = convert(start_rpynode, end_rpynode, next_getter, max_call_depth, max_nodes, time_limit=time_limit)
+        graph.stats["digests"] = digests
+        return graph
+
+    old = graph.stats["digests"]
+    changed = set(filename for filename in set(old) | set(digests) if old.get(filename) != digests.get(filename))
+    stats, metrics = graph.stats, graph.metrics
+    frontier = list(graph.frontier) # Left unexpanded by the budgets of convert, expanded now
+    graph, boundary, replayed = _rebind(graph, changed)
+    graph.stats, graph.metrics = stats, metrics
+    # Labels added since: the nodes leading to them had no children to tell
+    unresolved = set(stats.get("unresolved_labels", ()))
+    if unresolved:
+        queued = set(boundary)
+        boundary += [node for node in graph.nodes if node not in queued and unresolved.intersection(_targets(node))]
+    boundary += [node for node in frontier if graph.has_node(node) and node not in boundary]
+    graph.stats["digests"] = digests
+    renpy.display.log.write("Changed files: {}, kept {} nodes".format(len(changed), len(graph.nodes)))
+
+    start = graph.get_node(start_rpynode)
+    if start is None:
+        start = _new_node(graph, start_rpynode, [], NO_SCREENS)
+        boundary.append(start)
+    start.callers.add(None)
+    replayed.append(start) # It may have lost its callers if it could be reached from the removed nodes
+
+    next_getter = memoize(next_getter)
+    end = next_getter(end_rpynode, False) # The statement actually kept in the graph, as in convert
+    deadline = perf_counter() + time_limit if time_limit is not None else None
+    propagator = Propagator(graph, next_getter, max_call_depth)
+    propagator.restore()
+    for node in replayed:
+        propagator.replay(node)
+    graph.stats["stopped"] = None
+    expanded = graph.metrics.phase("Regeneration", _expand, graph, propagator, boundary, end, max_nodes, None, deadline)
+    pruned = _prune(graph, start)
+    graph.frontier = OrderedSet(node for node in graph.frontier if graph.has_node(node))
+    graph.stats["end_reached"] = end is not None and graph.has_node(end)
+
+    graph.stats["expanded"] = expanded
+    graph.stats["pruned"] = pruned
+    graph.stats["propagation_rounds"] = propagator.rounds
+    graph.stats["merged_contexts"] = propagator.merged
+    graph.stats["next_getter"] = next_getter.stats
+    graph.stats["unresolved_labels"] = unresolved_labels()
+    graph.stats["frontier"] = len(graph.frontier)
+    renpy.display.log.write("Expanded {} nodes, pruned {}".format(expanded, pruned))
+    if graph.stats["stopped"] is not None:
+        renpy.display.log.write("Stopped early ({}), {} nodes left unexpanded".format(graph.stats["stopped"], len(graph.frontier)))
+    return graph
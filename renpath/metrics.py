@@ -0,0 +1,105 @@
+import json
+from .typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from .utility import perf_counter, timed
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None # type: ignore # Python 2
+
+try:
+    from time import process_time
+except ImportError:
+    from time import clock as process_time # type: ignore # Python 2
+
+
+
+PROFILE = False # Time each generate_children, by node type (slows the generation down)
+TRACE_MEMORY = False # Peak memory of each phase, when tracemalloc is available (slows every phase down)
+
+
+
+T = TypeVar('T')
+
+class Metrics(object):
+    """Measures of the phases and counters of the events, by node type
+
+    Every graph has one (`Graph.metrics`), filled by the conversion, the
+    simplification and the cache. `counters` maps each event to the number
+    of times it happened for each type of node, `profile` the time spent in
+    `generate_children` for each type of node when PROFILE is set. Phases
+    record their peak memory only when TRACE_MEMORY is set.
+    """
+
+    def __init__(self):
+        # type: () -> None
+        self.phases = [] # type: List[Dict[str, Any]]
+        self.counters = {} # type: Dict[str, Dict[str, int]]
+        self.profile = {} # type: Dict[str, Dict[str, float]]
+
+    def phase(self, name, function, *args, **kwargs):
+        # type: (str, Callable[..., T], *Any, **Any) -> T
+        """Runs the function as `timed` does, recording its wall and CPU time (and peak memory with TRACE_MEMORY)"""
+        tracing = TRACE_MEMORY and tracemalloc is not None
+        started = tracing and not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        if tracing:
+            baseline = tracemalloc.get_traced_memory()[0]
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+
+        wall, cpu = perf_counter(), process_time()
+        result = timed(name, function, *args, **kwargs)
+        wall, cpu = perf_counter() - wall, process_time() - cpu
+
+        peak = None # type: Optional[int]
+        if tracing:
+            peak = max(tracemalloc.get_traced_memory()[1] - baseline, 0)
+        if started:
+            tracemalloc.stop()
+        self.phases.append({"name": name, "wall": wall, "cpu": cpu, "peak_memory": peak})
+        return result
+
+    def count(self, event, node, amount=1):
+        # type: (str, object, int) -> None
+        counter = self.counters.get(event)
+        if counter is None:
+            counter = self.counters[event] = {}
+        kind = node.__class__.__name__
+        counter[kind] = counter.get(kind, 0) + amount
+
+    def total(self, event):
+        # type: (str) -> int
+        return sum(self.counters.get(event, {}).values())
+
+    def generate_children(self, node, graph, next_getter):
+        # type: (Any, Any, Any) -> Any
+        """node.generate_children, timed when PROFILE is set"""
+        if not PROFILE:
+            return node.generate_children(graph, next_getter)
+        start = perf_counter()
+        edges = node.generate_children(graph, next_getter)
+        elapsed = perf_counter() - start
+        kind = node.__class__.__name__
+        entry = self.profile.get(kind)
+        if entry is None:
+            entry = self.profile[kind] = {"calls": 0, "seconds": 0.0}
+        entry["calls"] += 1
+        entry["seconds"] += elapsed
+        return edges
+
+    def to_json(self):
+        # type: () -> Dict[str, Any]
+        return {
+            "phases": self.phases,
+            "counters": self.counters,
+            "totals": dict((event, self.total(event)) for event in self.counters),
+            "profile": self.profile,
+        }
+
+    def dump(self, path):
+        # type: (str) -> None
+        with open(path, "w") as f:
+            json.dump(self.to_json(), f, indent=4, sort_keys=True)
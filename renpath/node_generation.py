@@ -1,5 +1,5 @@
 from renpath import renpy
-from .typing import Dict, Protocol, Type, Union
+from .typing import Any, Callable, Dict, Optional, Protocol, Type, Union
 
 from .classes.nodes import *
 
@@ -44,6 +44,15 @@ def _next__all(node, skip_first=True):
         node = node.next # type: ignore
     return node
 
+def _skip__normal(node):
+    # type: (renpy.ast.Node) -> bool
+    return isinstance(node, (
+        renpy.ast.Say,
+        renpy.ast.Translate,
+        renpy.ast.EndTranslate,
+        renpy.ast.Pass,
+    ))
+
 def _next__normal(node, skip_first=True):
     # type: (renpy.ast.Node, bool) -> Union[renpy.ast.Node, None]
     """Remove special nodes"""
@@ -51,23 +60,13 @@ def _next__normal(node, skip_first=True):
         return None
     if skip_first:
         node = node.next # type: ignore
-    while isinstance(node, (
-        renpy.ast.Say,
-        renpy.ast.Translate,
-        renpy.ast.EndTranslate,
-        renpy.ast.Pass,
-    )):
+    while _skip__normal(node):
         node = node.next # type: ignore
     return node
 
-def _next__minimalist(node, skip_first=True):
-    # type: (Union[renpy.ast.Node, None], bool) -> Union[renpy.ast.Node, None]
-    """Keeps branching nodes only"""
-    if node is None:
-        return None
-    if skip_first:
-        node = node.next
-    while not isinstance(node, (
+def _skip__minimalist(node):
+    # type: (renpy.ast.Node) -> bool
+    return not isinstance(node, (
         renpy.ast.Label,
         renpy.ast.Jump,
         renpy.ast.Call,
@@ -77,12 +76,89 @@ def _next__minimalist(node, skip_first=True):
         renpy.ast.Python,
         renpy.ast.UserStatement,
         type(None),
-    )):
+    ))
+
+def _next__minimalist(node, skip_first=True):
+    # type: (Union[renpy.ast.Node, None], bool) -> Union[renpy.ast.Node, None]
+    """Keeps branching nodes only"""
+    if node is None:
+        return None
+    if skip_first:
+        node = node.next
+    while _skip__minimalist(node):
         node = node.next
     return node
 
+SKIPPED = {
+    _next__normal: _skip__normal,
+    _next__minimalist: _skip__minimalist,
+} # type: Dict[NextGetter, Callable[[renpy.ast.Node], bool]] # Statements walked over by the getters
+
+
+
+class MemoizedNextGetter(object):
+    """Caches the successors found by a NextGetter
+
+    When `skipped` tells which statements the getter walks over, every
+    statement of a run it walked over then points to the end of the run
+    (path compression): each run is only walked once, whatever the number
+    of statements leading into it. Otherwise, each result is cached.
+    """
+
+    def __init__(self, next_getter, skipped=None):
+        # type: (NextGetter, Optional[Callable[[renpy.ast.Node], bool]]) -> None
+        self.next_getter = next_getter
+        self.skipped = skipped
+        self.resolved = {} # type: Dict[Any, Union[renpy.ast.Node, None]]
+        self.calls = 0
+        self.hits = 0
+        self.walked = 0 # Statements skipped
+
+    def __call__(self, node, skip_first=True):
+        # type: (renpy.ast.Node, bool) -> Union[renpy.ast.Node, None]
+        self.calls += 1
+        if self.skipped is None:
+            key = (node, skip_first)
+            if key in self.resolved:
+                self.hits += 1
+                return self.resolved[key]
+            result = self.resolved[key] = self.next_getter(node, skip_first)
+            return result
+
+        if node is None:
+            return None
+        if skip_first:
+            node = node.next # type: ignore
+        path = []
+        while node is not None and node not in self.resolved and self.skipped(node):
+            path.append(node)
+            node = node.next # type: ignore
+        if node is not None and node in self.resolved:
+            self.hits += 1 # The end of the run came from the cache
+            node = self.resolved[node]
+        self.walked += len(path)
+        for skipped in path:
+            self.resolved[skipped] = node
+        return node
+
+    @property
+    def stats(self):
+        # type: () -> Dict[str, Any]
+        return {
+            "calls": self.calls,
+            "hits": self.hits,
+            "hit_rate": float(self.hits) / self.calls if self.calls else 0.0,
+            "skipped": self.walked,
+        }
+
+def memoize(next_getter):
+    # type: (NextGetter) -> MemoizedNextGetter
+    if isinstance(next_getter, MemoizedNextGetter):
+        return next_getter
+    return MemoizedNextGetter(next_getter, SKIPPED.get(next_getter))
+
 def _new_node(graph, rpynode, parents, screens):
-    # type: (Graph, renpy.ast.Node, List[Edge], Dict[str, Screen]) -> Node
+    # type: (Graph, renpy.ast.Node, List[Edge], Union[ScreenState, Dict[str, Screen]]) -> Node
     for rpytype, nodetype in NODES_MAPPING.items():
         if isinstance(rpynode, rpytype):
             break
@@ -0,0 +1,192 @@
+from collections import deque
+from .typing import Deque, Dict, Iterable, Iterator, List, Optional, Union
+
+from .classes.ordered_set import OrderedSet
+
+def __mock_imports(): # type: ignore
+    # Mock imports for the linter
+    global Call, Edge, Graph, NextGetter, Node, Return
+    from classes.edge import Edge
+    from classes.graph import Graph
+    from classes.node import Node
+    from classes.nodes import Call, Return
+    from node_generation import NextGetter
+
+
+
+class Summary(object):
+    """Context shared by every call to a label made deeper than the depth limit"""
+
+    def __init__(self, label):
+        # type: (str) -> None
+        self.label = label
+        self.calls = OrderedSet() # type: OrderedSet[Call]
+        self.callers = OrderedSet() # type: OrderedSet[Call] # The frames below are not tracked
+
+    def __repr__(self):
+        # type: () -> str
+        return "{} ({})".format(self.__class__.__name__, self.label)
+
+class Propagator(object):
+    """Propagates the call stack through the graph until a fixed point is reached
+
+    Only the callers newly added to a node (its delta) are pushed to its
+    children, so the cost depends on the number of changes instead of the
+    number of nodes times the number of callers.
+
+    When `max_call_depth` is set, calls nested deeper than that push the
+    summary of their label instead of themselves (as with k-limited call
+    strings). Their returns then go back to every call merged in the summary.
+    """
+
+    def __init__(self, graph, next_getter, max_call_depth=None):
+        # type: (Graph, NextGetter, Optional[int]) -> None
+        self.graph = graph
+        self.next_getter = next_getter
+        self.max_call_depth = max_call_depth
+        self.merged = 0
+        self.todo = deque() # type: Deque[Node]
+        self.pending = {} # type: Dict[Node, OrderedSet[Optional[Call]]]
+        self.returns = {} # type: Dict[Call, OrderedSet[Return]]
+        self.rounds = 0
+        self._unwarped = {} # type: Dict[Call, OrderedSet[Call]]
+        self._callees = {} # type: Dict[Call, OrderedSet[Call]]
+        self._contexts = {} # type: Dict[Call, Union[Call, Summary]]
+        self._depths = {} # type: Dict[Call, int]
+        self._summaries = {} # type: Dict[str, Summary]
+
+    def add_callers(self, node, callers):
+        # type: (Node, Iterable[Optional[Call]]) -> None
+        from .classes.nodes import Call # Local to prevent circular imports
+        new = [caller for caller in callers if caller not in node.callers]
+        if not new:
+            return
+        node.callers.update(new)
+
+        if isinstance(node, Call):
+            for caller in new:
+                if caller is not None:
+                    self._callees.setdefault(caller, OrderedSet()).add(node)
+            self._invalidate(node)
+
+        if node in self.pending:
+            self.pending[node].update(new)
+        else:
+            self.pending[node] = OrderedSet(new)
+            self.todo.append(node)
+
+    def replay(self, node):
+        # type: (Node) -> None
+        """Propagates every caller of the node again, even the ones already pushed"""
+        if not node.callers:
+            return
+        if node in self.pending:
+            self.pending[node].update(node.callers)
+        else:
+            self.pending[node] = OrderedSet(node.callers)
+            self.todo.append(node)
+
+    def restore(self):
+        # type: () -> None
+        """Rebuilds the state left by the conversion of the nodes already in the graph"""
+        from .classes.nodes import Call, Return # Local to prevent circular imports
+        calls = [] # type: List[Call]
+        for node in self.graph.nodes:
+            for caller in node.callers:
+                if isinstance(caller, Summary):
+                    self._summaries[caller.label] = caller
+                    for call in caller.calls:
+                        self._contexts[call] = caller
+            if isinstance(node, Return):
+                for caller in node.callers:
+                    if caller is not None:
+                        self.returns.setdefault(caller, OrderedSet()).add(node)
+            elif isinstance(node, Call) and node.callers:
+                calls.append(node)
+
+        for call in calls:
+            if call not in self._contexts:
+                self._contexts[call] = call
+            for caller in call.callers:
+                if caller is not None:
+                    self._callees.setdefault(caller, OrderedSet()).add(call)
+
+        if self.max_call_depth is not None:
+            # Shortest nesting from the start, as when the calls were first reached
+            todo = deque(call for call in calls if None in call.callers and self._contexts[call] is call) # type: Deque[Call]
+            for call in todo:
+                self._depths[call] = 1
+            while todo:
+                call = todo.popleft()
+                for callee in self._callees.get(call, ()):
+                    if callee not in self._depths and self._contexts[callee] is callee:
+                        self._depths[callee] = self._depths[call] + 1
+                        todo.append(callee)
+
+    def push(self, edge):
+        # type: (Edge) -> None
+        """Propagates every caller of the start of a newly connected edge"""
+        if edge.start.callers:
+            edge.start.propagate_edge(self, edge, edge.start.callers)
+
+    def run(self):
+        # type: () -> Iterator[Edge]
+        """Propagates the pending callers, yields the returning edges found"""
+        while self.todo:
+            node = self.todo.popleft()
+            callers = self.pending.pop(node)
+            self.rounds += 1
+            self.graph.metrics.count("propagation_rounds", node)
+            for edge in node.propagate(self, callers):
+                yield edge
+
+    def context(self, call):
+        # type: (Call) -> Union[Call, Summary]
+        """Returns the context pushed by a call: itself or the summary of its label
+
+        The depth of a call is decided the first time it is reached.
+        """
+        context = self._contexts.get(call)
+        if context is not None:
+            return context
+
+        context = call
+        if self.max_call_depth is not None:
+            depth = 1 + min(self._depth(caller) for caller in call.callers)
+            if depth > self.max_call_depth:
+                label = call.origin.label
+                context = self._summaries.get(label)
+                if context is None:
+                    context = self._summaries[label] = Summary(label)
+                context.calls.add(call)
+                self.merged += 1
+            else:
+                self._depths[call] = depth
+        self._contexts[call] = context
+        return context
+
+    def _depth(self, caller):
+        # type: (Union[Call, Summary, None]) -> int
+        if caller is None:
+            return 0
+        return self._depths.get(caller, self.max_call_depth) # type: ignore # Summaries are always too deep
+
+    def unwarp_calls(self, call):
+        # type: (Call) -> OrderedSet[Call]
+        unwarped = self._unwarped.get(call)
+        if unwarped is None:
+            unwarped = self._unwarped[call] = call.unwarp_calls()
+        return unwarped
+
+    def _invalidate(self, call):
+        # type: (Call) -> None
+        # The calls made from this one (directly or not) include its callers
+        todo = [call]
+        done = set([call])
+        while todo:
+            current = todo.pop()
+            self._unwarped.pop(current, None)
+            for callee in self._callees.get(current, ()):
+                if callee not in done:
+                    done.add(callee)
+                    todo.append(callee)
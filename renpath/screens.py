@@ -1,26 +1,35 @@
+import weakref
 from ast import Name
 from renpath import renpy
 from .classes.edge import Edge
+from .conditions import TRUE, Condition, conjunction
+from .typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 from .utility import lookup_or_none
 
 def __mock_imports(): # type: ignore
     # Mock imports for the linter
-    global Graph, List, NextGetter, Node, Tuple, Union
+    global Graph, NextGetter, Node
     from node_generation import NextGetter
     from .classes.graph import Graph
     from .classes.node import Node
-    from .typing import List, Tuple, Union
+
+_ccache = None # type: Any
+_actions = {} # type: Dict[str, List[Tuple[str, Union[str, None]]]]
 
 def parse_actions(keywords):
     # type: (List[Tuple[str, object]]) -> List[Tuple[str, str | None]]
     # Don't you love some spaghetti code :yum:
+    global _ccache
     filtered = list(filter(lambda t: t[0] == "action", keywords))
     if not filtered:
         return []
     action_str = filtered[0][1]
+    if action_str in _actions:
+        return _actions[action_str]
 
-    ccache = renpy.pyanalysis.CompilerCache()
-    evaluation = ccache.ast_eval(action_str)
+    if _ccache is None:
+        _ccache = renpy.pyanalysis.CompilerCache()
+    evaluation = _ccache.ast_eval(action_str)
     if isinstance(evaluation, Name):
         ast_list = [] # TODO: Hotfix for DDLC, needs to verify utility
     elif hasattr(evaluation, "elts"):
@@ -42,6 +51,7 @@ def parse_actions(keywords):
         if keyword.args:
             actions.append((id_, keyword.args[0].s))
         actions.append((id_, None))
+    _actions[action_str] = actions
     return actions
 
 class Screen:
@@ -51,71 +61,157 @@ class Screen:
         self.base_screen = self.origin.function # type: renpy.sl2.slast.SLScreen
         # renpy.display.log.write("Found screen: " + self.base_screen.name) # TEMP
         self.base_screen.analyze_screen()
-    
-    def get_connections(self, start, graph, next_getter, edges=None, statement=None, condition=None):
-        # type: (Node, Graph, NextGetter, Union[List[Edge], None], Union[renpy.sl2.slast.SLNode, None], Union[str, None]) -> List[Edge]
-        from .node_generation import _new_node
+        self._template = None # type: Optional[List[Tuple[Condition, str, str]]]
+
+    @property
+    def template(self):
+        # type: () -> List[Tuple[Condition, str, str]]
+        """(condition, action, target label) of every jump in the screen, found once"""
+        if self._template is None:
+            self._template = list(self._walk(self.base_screen, TRUE))
+        return self._template
 
-        if edges is None:
-            edges = []
-        if statement is None:
-            statement = self.base_screen
-        if statement is None:
-            return [] # TEMP: Used because the linter is dumb
-
-        if isinstance(statement, renpy.sl2.slast.SLScreen):
-            for child in statement.children:
-                edges += self.get_connections(start, graph, next_getter, edges, child, condition)
-        
-        elif isinstance(statement, renpy.sl2.slast.SLDefault):
-            renpy.display.log.write("TODO: Screen Default [" + start.origin.filename + "#" + str(start.origin.linenumber) + "]") # TODO
+    def _todo(self, kind):
+        # type: (str) -> None
+        renpy.display.log.write("TODO: Screen " + kind + " [" + self.base_screen.name + "]") # TODO
+
+    def _walk(self, statement, condition):
+        # type: (Union[renpy.sl2.slast.SLNode, None], Condition) -> Iterator[Tuple[Condition, str, str]]
+        # Yields each jump once, in order, with an explicit stack whatever the nesting
+        todo = [(statement, condition)] # type: List[Tuple[Union[renpy.sl2.slast.SLNode, None], Condition]]
+        while todo:
+            statement, condition = todo.pop()
+            if statement is None:
+                continue # TEMP: Used because the linter is dumb
+            children = [] # type: List[Tuple[Union[renpy.sl2.slast.SLNode, None], Condition]]
+
+            if isinstance(statement, renpy.sl2.slast.SLScreen):
+                children = [(child, condition) for child in statement.children]
+            
+            elif isinstance(statement, renpy.sl2.slast.SLDefault):
+                self._todo("Default")
+                
+            elif isinstance(statement, renpy.sl2.slast.SLDisplayable):
+                for type_, value in parse_actions(statement.keyword):
+                    if value is None:
+                        continue # TEMP: Used because the linter is dumb
+                    if type_ == "Jump":
+                        yield (condition, type_, value)
+                children = [(child, condition) for child in statement.children]
+            
+            elif isinstance(statement, renpy.sl2.slast.SLFor):
+                self._todo("For")
             
-        elif isinstance(statement, renpy.sl2.slast.SLDisplayable):
-            # renpy.display.log.write("Displayable at: " + start.origin.filename + "#" + str(start.origin.linenumber)) # TEMP
-            actions = parse_actions(statement.keyword)
-            for type_, value in actions:
-                if value is None:
-                    continue # TEMP: Used because the linter is dumb
-                if type_ == "Jump":
-                    # renpy.display.log.write("Added connection " + str(start) + " -> " + value) # TEMP
-                    # Copied the code over from Jump.generate_children
-                    target = lookup_or_none(value) # type: renpy.ast.Node
-                    next_ = next_getter(target, False)
-                    if next_ is None:
-                        return []
-                    child = graph.get_node(next_) or _new_node(graph, next_, [], dict(start.screens))
-                    edge = Edge(start, child, choice="Jump " + value)
-                    edge = graph.get_edge(edge) or edge
-                    edges.append(edge)
-                    # By not adding the edge to the graph right away, the destination node will automatically be scanned
-            for child in statement.children:
-                edges += self.get_connections(start, graph, next_getter, edges, child, condition)
-        
-        elif isinstance(statement, renpy.sl2.slast.SLFor):
-            renpy.display.log.write("TODO: Screen For [" + start.origin.filename + "#" + str(start.origin.linenumber) + "]") # TODO
-        
-        elif isinstance(statement, renpy.sl2.slast.SLIf):
-            for new_condition, block in statement.entries:
-                if condition is not None:
-                    new_condition = "(" + condition + ") and (" + new_condition + ")"
-                for child in block.children:
-                    # TODO: Condition
-                    edges += self.get_connections(start, graph, next_getter, edges, child, new_condition)
-        
-        elif isinstance(statement, renpy.sl2.slast.SLPython):
-            renpy.display.log.write("TODO: Screen Python [" + start.origin.filename + "#" + str(start.origin.linenumber) + "]") # TODO
-        
-        elif isinstance(statement, renpy.sl2.slast.SLShowIf):
-            renpy.display.log.write("TODO: Screen ShowIf [" + start.origin.filename + "#" + str(start.origin.linenumber) + "]") # TODO
-        
-        elif isinstance(statement, renpy.sl2.slast.SLUse):
-            renpy.display.log.write("TODO: Screen Use [" + start.origin.filename + "#" + str(start.origin.linenumber) + "]") # TODO
-        
-        else:
-            raise NotImplementedError("cannot use screen statement " + str(type(statement)) + "yet")
-        
+            elif isinstance(statement, renpy.sl2.slast.SLIf):
+                for new_condition, block in statement.entries:
+                    new_condition = conjunction((condition, new_condition))
+                    children += [(child, new_condition) for child in block.children]
+            
+            elif isinstance(statement, renpy.sl2.slast.SLPython):
+                self._todo("Python")
+            
+            elif isinstance(statement, renpy.sl2.slast.SLShowIf):
+                self._todo("ShowIf")
+            
+            elif isinstance(statement, renpy.sl2.slast.SLUse):
+                self._todo("Use")
+            
+            else:
+                raise NotImplementedError("cannot use screen statement " + str(type(statement)) + "yet")
+
+            todo += reversed(children) # First child on top
+
+    def get_connections(self, start, graph, next_getter):
+        # type: (Node, Graph, NextGetter) -> List[Edge]
+        from .node_generation import _new_node
+
+        edges = []
+        for _, type_, value in self.template:
+            graph.metrics.count("screen_connections", start)
+            # Copied the code over from Jump.generate_children
+            target = lookup_or_none(value) # type: renpy.ast.Node
+            next_ = next_getter(target, False)
+            if next_ is None:
+                continue
+            child = graph.get_node(next_) or _new_node(graph, next_, [], start.screens)
+            edge = Edge(start, child, choice=type_ + " " + value) # TODO: Condition
+            edge = graph.get_edge(edge) or edge
+            edges.append(edge)
+            # By not adding the edge to the graph right away, the destination node will automatically be scanned
         return edges
 
+class ScreenState(object):
+    """Screens shown at a node, immutable and interned: nodes with the same screens share it
+
+    Use `screen_state` to create one. Showing or hiding a screen gives
+    another state, so comparing two states is comparing their identity.
+    Screens are kept by name: the order they were shown in does not matter.
+    """
+    __slots__ = ("_items", "_screens", "__weakref__")
+
+    def __init__(self, items):
+        # type: (Tuple[Tuple[str, Screen], ...]) -> None
+        self._items = items
+        self._screens = dict(items)
+
+    def show(self, name, screen):
+        # type: (str, Screen) -> ScreenState
+        if name in self._screens:
+            return self
+        return _intern_state(tuple(sorted(self._items + ((name, screen),), key=_name)))
+
+    def hide(self, name):
+        # type: (str) -> ScreenState
+        if name not in self._screens:
+            return self
+        return _intern_state(tuple(item for item in self._items if item[0] != name))
+
+    def values(self):
+        # type: () -> List[Screen]
+        return [screen for _, screen in self._items]
+
+    def __getitem__(self, name):
+        # type: (str) -> Screen
+        return self._screens[name]
+
+    def __contains__(self, name):
+        # type: (str) -> bool
+        return name in self._screens
+
+    def __iter__(self):
+        # type: () -> Iterator[str]
+        return iter(name for name, _ in self._items)
+
+    def __len__(self):
+        # type: () -> int
+        return len(self._items)
+
+    def __repr__(self):
+        # type: () -> str
+        return "{}({})".format(self.__class__.__name__, [name for name, _ in self._items])
+
+def _name(item):
+    # type: (Tuple[str, Screen]) -> str
+    return item[0]
+
+_states = weakref.WeakValueDictionary() # type: weakref.WeakValueDictionary[Tuple[Tuple[str, Screen], ...], ScreenState]
+
+def _intern_state(items):
+    # type: (Tuple[Tuple[str, Screen], ...]) -> ScreenState
+    # items sorted by name, the same screens always give the same key
+    state = _states.get(items)
+    if state is None:
+        state = _states[items] = ScreenState(items)
+    return state
+
+def screen_state(screens):
+    # type: (Union[ScreenState, Dict[str, Screen]]) -> ScreenState
+    if isinstance(screens, ScreenState):
+        return screens
+    return _intern_state(tuple(sorted(screens.items(), key=_name)))
+
+NO_SCREENS = screen_state({})
+
 __screens = {} # type: dict[str, Screen]
 
 def get_screen(name):
@@ -1,8 +1,10 @@
+import heapq
 import re
 from renpath import renpy
-from .typing import Tuple, Type
+from .typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Type
 
 from .classes.edge import Edge
+from .conditions import TRUE, conjunction, disjunction
 
 def __mock_imports(): # type: ignore
     # Mock imports for the linter
@@ -30,30 +32,113 @@ PYTHON_IGNORE = [
 	r"^set_mode_nvl\(\)",
 ]
 
+SCREEN_STATEMENTS = ("show screen", "hide screen", "call screen")
 
+# Classification of a node, only depends on its origin
+_KEPT = 0 # Always kept
+_REMOVABLE = 1 # Only kept as the root of a branch
+_IGNORED = 2 # Only kept when it has no connections
+
+
+
+def _compile_ignore(patterns):
+    # type: (Iterable[str]) -> Any
+    """Compiles the patterns into a single alternation, None if empty"""
+    patterns = list(patterns)
+    if not patterns:
+        return None
+    return re.compile("|".join("(?:" + pattern + ")" for pattern in patterns))
+
+_PYTHON_IGNORE_RE = _compile_ignore(PYTHON_IGNORE)
+
+def _classify(node, ignore):
+    # type: (Node, Any) -> int
+    origin = node.origin
+    if isinstance(origin, renpy.ast.Python) and ignore is not None and ignore.match(origin.code.source):
+        return _IGNORED # System command or unwanted assignation # TODO
+    if isinstance(origin, renpy.ast.UserStatement) and origin.get_name() in SCREEN_STATEMENTS:
+        return _KEPT # Screen call
+    if isinstance(origin, KEEP):
+        return _KEPT
+    return _REMOVABLE
+
+def _keep(node, classification):
+    # type: (Node, int) -> bool
+    if classification == _KEPT:
+        return True
+    if classification == _REMOVABLE:
+        return not node.parents # Keep root of branches and single nodes
+    return not node.parents and not node.children # Single node with no connections
+
+
+
+def _mergeable(node, simplify_menus):
+    # type: (Node, bool) -> bool
+    return isinstance(node.origin, renpy.ast.If) or (simplify_menus and isinstance(node.origin, renpy.ast.Menu))
+
+class _Worklist(object):
+    """Nodes to visit again, in the order they had in the graph
+
+    A node added while visiting a later one waits for the next visit,
+    like it would with a new pass over every node.
+    """
+
+    def __init__(self, nodes, positions):
+        # type: (List[Node], Dict[Node, int]) -> None
+        self.nodes = nodes
+        self.positions = positions
+        self.current = None # type: Optional[int]
+        self.heap = [] # type: List[int]
+        self.queued = set() # type: Set[int]
+        self.later = set() # type: Set[int]
+
+    def add(self, node):
+        # type: (Node) -> None
+        position = self.positions[node]
+        if self.current is None or position <= self.current:
+            self.later.add(position)
+        elif position not in self.queued:
+            self.queued.add(position)
+            heapq.heappush(self.heap, position)
+
+    def visit(self):
+        # type: () -> Iterator[Node]
+        self.heap = sorted(self.later) # A sorted list is a valid heap
+        self.queued = self.later
+        self.later = set()
+        while self.heap:
+            self.current = heapq.heappop(self.heap)
+            self.queued.discard(self.current)
+            yield self.nodes[self.current]
+        self.current = None
 
 def _remove_node(node, graph):
-    # type: (Node, Graph) -> None
-    old_parents = node.parents[:]
-    old_children = node.children[:]
+    # type: (Node, Graph) -> List[Node]
+    """Splices the node out of the graph, returns the neighbours that changed"""
+    old_parents = list(node.parents)
+    old_children = list(node.children)
+    graph.metrics.count("splices", node)
 
     # Remove old
-    graph.nodes.remove(node)
+    graph.remove_node(node)
     for parent_edge in old_parents:
-        parent_edge.start.children.remove(parent_edge)
-        graph.edges.remove(parent_edge)
+        parent_edge.start.children.discard(parent_edge)
+        graph.remove_edge(parent_edge)
     for child_edge in old_children:
-        child_edge.end.parents.remove(child_edge)
-        graph.edges.remove(child_edge)
+        child_edge.end.parents.discard(child_edge)
+        graph.remove_edge(child_edge)
+
+    # Edges looping on the node itself would reconnect to it once removed
+    old_parents = [edge for edge in old_parents if edge.start != node]
+    old_children = [edge for edge in old_children if edge.end != node]
 
     # Deal with call stacks
     if isinstance(node.origin, renpy.ast.Return):
         uniques = [] # type: list[Edge]
+        seen = set() # type: set[tuple[Node, Node]]
         for child_edge in old_children:
-            for other in uniques:
-                if child_edge.start == other.start and child_edge.end == other.end:
-                    break
-            else:
+            if (child_edge.start, child_edge.end) not in seen:
+                seen.add((child_edge.start, child_edge.end))
                 uniques.append(child_edge)
         old_children = uniques
         # TODO: Remove edges that have a non-matching call stack
@@ -66,50 +151,63 @@ def _remove_node(node, graph):
                 # Looping on itself: skipping
                 continue
 
-            # TODO: Temporary hack to simply the condition
-            pc, cc = parent_edge.condition, child_edge.condition
-            if pc == "False" or cc == "False":
-                condition = "False"
-            elif pc != "True" and cc != "True" and pc != cc:
-                condition = pc + " and " + cc
-            elif cc != "True":
-                condition = cc
-            else:
-                condition = pc
-
+            condition = conjunction((parent_edge.condition, child_edge.condition))
             edge = Edge(parent_edge.start, child_edge.end, condition, parent_edge.choice)
-            parent_edge.start.children.append(edge)
-            child_edge.end.parents.append(edge)
-            graph.edges.append(edge)
+            if graph.has_edge(edge):
+                continue # Already connected through another path
+            parent_edge.start.children.add(edge)
+            child_edge.end.parents.add(edge)
+            graph.add_edge(edge)
+
+    return [edge.start for edge in old_parents] + [edge.end for edge in old_children]
+
+def simplify(graph, simplify_menus=False, python_ignore=None):
+    # type: (Graph, bool, Optional[Iterable[str]]) -> None
+    # python_ignore: patterns of the python statements to remove, PYTHON_IGNORE by default
+    graph.metrics.phase("Simplification", _simplify, graph, simplify_menus, python_ignore)
 
-def simplify(graph, simplify_menus=False):
-    # type: (Graph, bool) -> None
+def _simplify(graph, simplify_menus, python_ignore):
+    # type: (Graph, bool, Optional[Iterable[str]]) -> None
+    if python_ignore is None:
+        ignore = _PYTHON_IGNORE_RE
+    else:
+        ignore = _compile_ignore(python_ignore)
+    classifications = {} # type: Dict[Node, int]
+
+    # Only the nodes whose parents or children changed need to be visited again
+    nodes = graph.nodes
+    positions = dict((node, i) for i, node in enumerate(nodes))
+    removals = _Worklist(nodes, positions)
+    merges = _Worklist(nodes, positions)
+
+    def changed_nodes(changed):
+        # type: (Iterable[Node]) -> None
+        for node in changed:
+            removals.add(node)
+            if _mergeable(node, simplify_menus):
+                merges.add(node)
+    changed_nodes(nodes)
 
     changed = True
     while changed:
         changed = False
 
         # Remove unwanted nodes
-        for node in graph.nodes[:]:
-            keep = isinstance(node.origin, KEEP)
-            if not keep and (not node.parents and node.children):
-                keep = True # Keep root of branches
-            if isinstance(node.origin, renpy.ast.Python) and any(re.match(pattern, node.origin.code.source) for pattern in PYTHON_IGNORE):
-                keep = False # System command or unwanted assignation # TODO
-            if isinstance(node.origin, renpy.ast.UserStatement) and node.origin.get_name() in ("show screen", "hide screen", "call screen"):
-                keep = True # Screen call
-            if not node.parents and not node.children:
-                keep = True # Single node with no connections
-
-            if keep:
-                continue
-            _remove_node(node, graph)
+        for node in removals.visit():
+            if not graph.has_node(node):
+                continue # Already removed
+            classification = classifications.get(node)
+            if classification is None:
+                classification = classifications[node] = _classify(node, ignore)
+            if _keep(node, classification) or node in graph.frontier:
+                continue # Kept to show where the conversion stopped
+            changed_nodes(_remove_node(node, graph))
             changed = True
 
         # Simplify ifs (and menus) and remove them
-        for node in graph.nodes[:]:
-            if not (isinstance(node.origin, renpy.ast.If) or (simplify_menus and isinstance(node.origin, renpy.ast.Menu))):
-                continue
+        for node in merges.visit():
+            if not graph.has_node(node):
+                continue # Already removed
             grouped_edges = {} # type: dict[Node, list[Edge]]
             for edge in node.children:
                 if edge.end not in grouped_edges:
@@ -119,36 +217,32 @@ def simplify(graph, simplify_menus=False):
             for end, group in grouped_edges.items():
                 if len(group) == 1:
                     continue
-                # TODO: Temporary hack to simply the condition
-                conditions = [
-                    edge.condition for edge in group
-                    if edge.condition != "False"
-                ] or ["False"]
-                if "True" in conditions:
-                    condition = "True"
-                elif len(conditions) == 1:
-                    condition = conditions[0]
-                else:
-                    condition = "(" + " or ".join(conditions) + ")"
-
+                condition = disjunction(edge.condition for edge in group)
                 for edge in group:
                     node.children.remove(edge)
                     end.parents.remove(edge)
-                    graph.edges.remove(edge)
+                    graph.remove_edge(edge)
                 edge = Edge(node, end, condition)
-                node.children.append(edge)
-                end.parents.append(edge)
-                graph.edges.append(edge)
+                node.children.add(edge)
+                end.parents.add(edge)
+                graph.add_edge(edge)
+                changed_nodes((node, end))
 
             # If there aren't too many edges, remove it
             if len(node.children) <= 1: # or len(node.parents) * len(node.edges) < MAX_IF_REDUCTION: # FIXME
                 if len(node.children) > 1 and any(isinstance(parent.start.origin, renpy.ast.Menu) for parent in node.parents):
                     continue # Cannot be removed because it would split the menu's choice
-                _remove_node(node, graph)
+                if node in graph.frontier:
+                    continue # Not expanded, its children are unknown
+                changed_nodes(_remove_node(node, graph))
                 changed = True
 
+    _remove_screen_defaults(graph)
+
+def _remove_screen_defaults(graph):
+    # type: (Graph) -> None
     # Remove unecessary jumps from screens
-    for edge in graph.edges[:]:
+    for edge in graph.edges:
         if edge.choice is None or not edge.choice.startswith("Jump "):
             continue
 
@@ -157,24 +251,31 @@ def simplify(graph, simplify_menus=False):
 
         no_default = True
         for edge2 in start.children:
-            if edge2.end == end and (not edge2.condition or edge2.condition == "True") and edge2.choice is None:
+            if edge2.end == end and edge2.condition is TRUE and edge2.choice is None:
                 no_default = False
                 break
         if no_default:
             continue
 
         # Remove the defaults
-        for edge2 in start.children[:]:
-            if edge2.end != end or (edge2.condition and edge2.condition != "True") or edge2.choice is not None:
+        for edge2 in list(start.children):
+            if edge2.end != end or edge2.condition is not TRUE or edge2.choice is not None:
                 continue
             start.children.remove(edge2)
             end.parents.remove(edge2)
-            graph.edges.remove(edge2)
+            graph.remove_edge(edge2)
         
         # If only screen jump, make it default
         if len(start.children) == 1:
-            edge.condition = "True"
+            # Indexed by condition and choice: detach before modifying
+            start.children.remove(edge)
+            end.parents.remove(edge)
+            graph.remove_edge(edge)
+            edge.condition = TRUE
             edge.choice = None
+            start.children.add(edge)
+            end.parents.add(edge)
+            graph.add_edge(edge)
 
     pass
 
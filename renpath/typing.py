@@ -1,17 +1,25 @@
 # type: ignore
 try:
-    from typing import Any, Callable, Dict, Iterator, List, Protocol, Tuple, Type, TypeVar, Union, Optional
+    from typing import Any, Callable, Deque, Dict, IO, Iterable, Iterator, List, Protocol, Set, Tuple, Type, TypeVar, Union, Optional
 except ImportError:
     # Typing not available in renpy, use placeholders
     Any = object()
     class Callable:
         pass
+    class Deque:
+        pass
     Dict = dict()
+    class IO:
+        pass
+    class Iterable:
+        pass
     class Iterator:
         pass
     List = list()
     class Protocol:
         pass
+    class Set:
+        pass
     class Tuple:
         pass
     class Type:
@@ -1,5 +1,11 @@
+import hashlib
+import os
+from array import array
+from collections import OrderedDict
 from renpath import renpy
-from .typing import Any, Callable, TypeVar, Union
+from .typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar, Union
+
+from .classes.ordered_set import OrderedSet
 
 try:
     from time import perf_counter
@@ -30,7 +36,43 @@ def timed(name, function, *args, **kwargs):
     renpy.display.log.write("==========")
     return result
 
-def lookup_or_none(name):
+MAX_SOURCES = 16 # Files kept by source_line
+
+_sources = OrderedDict() # type: OrderedDict[str, Tuple[Tuple[float, int], bytes, array]]
+
+def _source(path):
+    # type: (str) -> Tuple[bytes, array]
+    """Content and line offsets of a file, read once while it does not change"""
+    stat = os.stat(path)
+    version = (stat.st_mtime, stat.st_size)
+    source = _sources.pop(path, None)
+    if source is None or source[0] != version:
+        with open(path, "rb") as f:
+            data = f.read()
+        offsets = array("l", [0])
+        position = data.find(b"\n")
+        while position >= 0:
+            offsets.append(position + 1)
+            position = data.find(b"\n", position + 1)
+        source = (version, data, offsets)
+        while len(_sources) >= MAX_SOURCES:
+            _sources.popitem(last=False) # Least recently used
+    _sources[path] = source
+    return source[1], source[2]
+
+def source_line(filename, linenumber):
+    # type: (str, int) -> Optional[str]
+    """Line of a script file (starting at 1), None when it cannot be read"""
+    try:
+        data, offsets = _source(filename.replace(".rpyc", ".rpy"))
+    except (IOError, OSError):
+        return None
+    if not 1 <= linenumber <= len(offsets):
+        return None
+    end = offsets[linenumber] if linenumber < len(offsets) else len(data)
+    return data[offsets[linenumber - 1]:end].decode("utf-8", "replace")
+
+def _lookup(name):
     # type: (str) -> Union[renpy.ast.Node, None]
     try:
         return renpy.game.script.lookup_or_none(name) # type: ignore
@@ -39,3 +81,80 @@ def lookup_or_none(name):
             return renpy.game.script.lookup(name) # type: ignore
         except renpy.script.ScriptError:
             return None
+
+_labels = None # type: Optional[Tuple[List[renpy.ast.Node], int, Dict[str, Union[renpy.ast.Node, None]], OrderedSet[str]]]
+
+def _label_table():
+    # type: () -> Tuple[Dict[str, Union[renpy.ast.Node, None]], OrderedSet[str]]
+    """Labels by name and names that cannot be resolved, built once while the script does not change"""
+    global _labels
+    statements = renpy.game.script.all_stmts # type: ignore
+    if _labels is None or _labels[0] is not statements or _labels[1] != len(statements):
+        labels = {} # type: Dict[str, Union[renpy.ast.Node, None]]
+        unresolved = OrderedSet() # type: OrderedSet[str]
+        # Every target is resolved now, dynamic ones (jump expression) never are
+        # Through the script, not its namemap: config.label_overrides apply
+        for rpynode in statements:
+            if isinstance(rpynode, renpy.ast.Jump):
+                name = rpynode.target
+            elif isinstance(rpynode, renpy.ast.Call):
+                name = rpynode.label
+            else:
+                continue
+            if getattr(rpynode, "expression", False):
+                unresolved.add(name)
+                continue
+            if name in labels:
+                continue
+            labels[name] = _lookup(name)
+            if labels[name] is None:
+                unresolved.add(name)
+        _labels = (statements, len(statements), labels, unresolved)
+    return _labels[2], _labels[3]
+
+def lookup_or_none(name):
+    # type: (str) -> Union[renpy.ast.Node, None]
+    labels, unresolved = _label_table()
+    if name not in labels:
+        labels[name] = _lookup(name) # Not a jump or call target (screen action)
+        if labels[name] is None:
+            unresolved.add(name)
+    return labels[name]
+
+def unresolved_labels():
+    # type: () -> List[str]
+    """Targets of jumps, calls and screen actions that are not labels (or are expressions)"""
+    return list(_label_table()[1])
+
+def _statements_digest(digest, rpynodes):
+    # type: (Any, List[renpy.ast.Node]) -> None
+    for rpynode in rpynodes:
+        try:
+            code = rpynode.get_code()
+        except Exception:
+            code = None # Not every statement can give its code back
+        digest.update(repr((rpynode.__class__.__name__, rpynode.linenumber, code)).encode("utf-8"))
+        digest.update(b"\0")
+
+def script_digests():
+    # type: () -> Dict[str, str]
+    """Hash of the content of each script file (of its statements when it is not on disk), by filename"""
+    statements = OrderedDict() # type: OrderedDict[str, List[renpy.ast.Node]]
+    for rpynode in renpy.game.script.all_stmts: # type: ignore
+        statements.setdefault(rpynode.filename, []).append(rpynode)
+
+    digests = {} # type: Dict[str, str]
+    for filename, rpynodes in statements.items():
+        digest = hashlib.sha1()
+        for path in (filename.replace(".rpyc", ".rpy"), filename):
+            try:
+                with open(path, "rb") as f:
+                    digest.update(f.read())
+                break
+            except (IOError, OSError):
+                continue
+        else:
+            # Not on disk (archive): the statements loaded from it stand for its content
+            _statements_digest(digest, rpynodes)
+        digests[filename] = digest.hexdigest()
+    return digests
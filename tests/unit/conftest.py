@@ -0,0 +1,25 @@
+"""Runs renpath outside of Ren'Py, with the stand-ins of benchmarks/standin.py
+
+Every test shares the same renpy module: renpath keeps the one it was
+imported with. Use `load` to switch to another script.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+sys.path.insert(0, ROOT)
+
+from standin import ScreenOrigin, install
+
+renpy = install()
+
+
+
+def load(script, screens=None):
+    """Makes the script (and its screens) the one renpath works on"""
+    import renpath.screens
+    renpy.game.script = script
+    renpy.display.screen.screens = dict(((name, None), ScreenOrigin(screen)) for name, screen in (screens or {}).items())
+    getattr(renpath.screens, "__screens").clear() # Screens of the previous script
+    return script
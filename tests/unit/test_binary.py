@@ -0,0 +1,42 @@
+"""A dumped graph must read back as its serial does"""
+import json
+
+import pytest
+from conftest import load
+from synthetic import generate
+
+from renpath.classes.binary import MappedGraph
+from renpath.classes.graph import Graph
+from renpath.conversion import convert
+from renpath.node_generation import _next__normal
+
+
+
+@pytest.fixture(params=range(3))
+def graph(request):
+    seed = request.param
+    script, screens = generate(labels=25, fanout=2 + seed, call_depth=seed, if_chain=1 + seed, screens=seed % 2, says=2, seed=seed)
+    load(script, screens)
+    return convert(script.lookup("start"), None, _next__normal)
+
+def dumped(graph, tmp_path):
+    path = str(tmp_path / "graph.bin")
+    with open(path, "wb") as f:
+        graph.dump(f)
+    return MappedGraph(path)
+
+def test_to_graph_same_as_deserialize(graph, tmp_path):
+    with dumped(graph, tmp_path) as mapped:
+        assert len(mapped) == len(graph.nodes)
+        assert mapped.to_graph().serialize() == Graph.deserialize(graph.serialize()).serialize()
+
+def test_queries_same_as_serial(graph, tmp_path):
+    serial = json.loads(graph.serialize())
+    with dumped(graph, tmp_path) as mapped:
+        for i, node in enumerate(serial["nodes"]):
+            assert "{}#{}".format(*mapped.location(i)) == node["location"]
+            assert list(mapped.children(i)) == node["children"]
+            assert list(mapped.parents(i)) == node["parents"]
+            assert mapped.callers(i) == node["callers"]
+            assert mapped.successors(i) == [serial["edges"][edge]["end"] for edge in node["children"]]
+            assert mapped.predecessors(i) == [serial["edges"][edge]["start"] for edge in node["parents"]]
@@ -0,0 +1,35 @@
+"""cached_convert must not return the graph of another script"""
+from conftest import load
+from standin import Jump, Label, Menu, Return, Say, Script, chain
+
+from renpath.cache import cached_convert
+from renpath.conversion import convert
+from renpath.node_generation import _next__normal
+from renpath.simplification import simplify
+
+
+
+def statements(choices):
+    """start asks where to go, in a file that is not on disk (as in an archive)"""
+    at = dict(filename="archived.rpy")
+    labels = [
+        Label("place_{}".format(i), [Say(str(i), linenumber=10 * i + 11, **at), Return(linenumber=10 * i + 12, **at)], linenumber=10 * i + 10, **at)
+        for i in range(choices)
+    ]
+    menu = Menu([("place {}".format(i), "True", [Jump("place_{}".format(i), linenumber=i + 3, **at)]) for i in range(choices)], linenumber=2, **at)
+    return Script(chain([Label("start", [menu], linenumber=1, **at)] + labels))
+
+def test_archived_script_changed(tmp_path):
+    script = load(statements(2))
+    graph = cached_convert(script.lookup("start"), None, _next__normal, directory=str(tmp_path))
+    assert graph.stats["cache"] == "miss"
+    graph = cached_convert(script.lookup("start"), None, _next__normal, directory=str(tmp_path))
+    assert graph.stats["cache"] == "hit"
+
+    script = load(statements(3)) # Same file names, different statements
+    graph = cached_convert(script.lookup("start"), None, _next__normal, directory=str(tmp_path))
+    expected = convert(script.lookup("start"), None, _next__normal)
+    simplify(expected)
+
+    assert graph.stats["cache"] == "miss"
+    assert len(graph.nodes) == len(expected.nodes)
@@ -0,0 +1,32 @@
+"""Partitions must survive simplification and get a file each"""
+import os
+
+from conftest import load
+from synthetic import generate
+
+from renpath.conversion import convert
+from renpath.node_generation import _next__normal
+from renpath.simplification import simplify
+
+
+
+def test_labels_after_simplify(tmp_path):
+    script, screens = generate(labels=25, fanout=2, call_depth=1, if_chain=2, screens=0, says=2, seed=0)
+    load(script, screens)
+    graph = convert(script.lookup("start"), None, _next__normal)
+    simplify(graph)
+
+    paths = graph.vizualize(str(tmp_path / "path.dot"), partition="label", separate=True)
+    assert len(paths) > 1
+    assert all(os.path.exists(path) for path in paths)
+
+def test_colliding_names(tmp_path):
+    script, screens = generate(labels=25, fanout=2, call_depth=1, if_chain=2, screens=0, says=2, seed=0)
+    load(script, screens)
+    for i, rpynode in enumerate(script.all_stmts):
+        rpynode.filename = "a b.rpy" if i % 2 else "a_b.rpy" # Both sanitized to a_b.rpy
+    graph = convert(script.lookup("start"), None, _next__normal)
+
+    paths = graph.vizualize(str(tmp_path / "path.dot"), partition="file", separate=True)
+    assert len(paths) == 2
+    assert len(set(paths)) == 2
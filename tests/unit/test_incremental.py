@@ -0,0 +1,77 @@
+"""regenerate must give the graph a conversion from scratch would give"""
+from conftest import load
+from standin import Jump, Label, Return, Say, Script, chain
+
+import renpath.incremental
+from renpath.conversion import convert
+from renpath.incremental import regenerate
+from renpath.node_generation import _next__normal
+
+
+
+def statements(later):
+    """start (a.rpy) jumps to later, only defined in b.rpy when asked"""
+    a = [Label("start", [Say("a", filename="a.rpy", linenumber=2), Jump("later", filename="a.rpy", linenumber=3)], filename="a.rpy", linenumber=1)]
+    b = [Label("other", [Say("b", filename="b.rpy", linenumber=2), Return(filename="b.rpy", linenumber=3)], filename="b.rpy", linenumber=1)]
+    if later:
+        b.append(Label("later", [Say("c", filename="b.rpy", linenumber=5), Say("d", filename="b.rpy", linenumber=6), Return(filename="b.rpy", linenumber=7)], filename="b.rpy", linenumber=4))
+    return Script(chain(a + b))
+
+def locations(graph):
+    return sorted((node.origin.filename, node.origin.linenumber) for node in graph.nodes)
+
+def test_label_added(monkeypatch):
+    monkeypatch.setattr(renpath.incremental, "script_digests", lambda: {"a.rpy": "1", "b.rpy": "1"})
+    script = load(statements(later=False))
+    graph = regenerate(None, script.lookup("start"), None, _next__normal)
+    assert "later" in graph.stats["unresolved_labels"]
+
+    monkeypatch.setattr(renpath.incremental, "script_digests", lambda: {"a.rpy": "1", "b.rpy": "2"})
+    script = load(statements(later=True))
+    graph = regenerate(graph, script.lookup("start"), None, _next__normal)
+    expected = convert(script.lookup("start"), None, _next__normal)
+
+    assert locations(graph) == locations(expected)
+    assert len(graph.edges) == len(expected.edges)
+
+def test_end_kept(monkeypatch):
+    monkeypatch.setattr(renpath.incremental, "script_digests", lambda: {"a.rpy": "1", "b.rpy": "1"})
+    script = load(Script(chain([
+        Label("start", [Jump("later", filename="a.rpy", linenumber=2)], filename="a.rpy", linenumber=1),
+        Label("later", [Say("b", filename="b.rpy", linenumber=2), Jump("other", filename="b.rpy", linenumber=3)], filename="b.rpy", linenumber=1),
+        Label("other", [Say("c", filename="b.rpy", linenumber=5), Return(filename="b.rpy", linenumber=6)], filename="b.rpy", linenumber=4),
+    ])))
+    end = script.lookup("later").block[1] # Jump other, in the changed file
+    graph = regenerate(None, script.lookup("start"), end, _next__normal)
+
+    monkeypatch.setattr(renpath.incremental, "script_digests", lambda: {"a.rpy": "1", "b.rpy": "2"})
+    graph = regenerate(graph, script.lookup("start"), end, _next__normal)
+    expected = convert(script.lookup("start"), end, _next__normal)
+
+    assert len(graph.get_node(end).children) == 0
+    assert graph.stats["end_reached"]
+    assert locations(graph) == locations(expected)
+
+def test_archived_file_changed():
+    # No script_digests stand-in: neither file is on disk, as in an archive
+    def statements(detour):
+        at = dict(filename="b.rpy")
+        later = [Say("b", linenumber=2, **at)]
+        if detour:
+            later.append(Jump("other", linenumber=3, **at))
+        later.append(Return(linenumber=4, **at))
+        return Script(chain([
+            Label("start", [Say("a", filename="a.rpy", linenumber=2), Jump("later", filename="a.rpy", linenumber=3)], filename="a.rpy", linenumber=1),
+            Label("later", later, linenumber=1, **at),
+            Label("other", [Say("c", linenumber=6, **at), Return(linenumber=7, **at)], linenumber=5, **at),
+        ]))
+
+    script = load(statements(detour=False))
+    graph = regenerate(None, script.lookup("start"), None, _next__normal)
+
+    script = load(statements(detour=True))
+    graph = regenerate(graph, script.lookup("start"), None, _next__normal)
+    expected = convert(script.lookup("start"), None, _next__normal)
+
+    assert locations(graph) == locations(expected)
+    assert len(graph.edges) == len(expected.edges)
@@ -0,0 +1,21 @@
+"""The successors cache must only count the lookups it answered as hits"""
+from standin import Jump, Label, Menu, Say, Script, chain
+
+from renpath.node_generation import _next__minimalist, memoize
+
+
+
+def test_cold_cache_has_no_hits():
+    choices = [("Choice {}".format(i), "True", [Jump("start", linenumber=10 + i)]) for i in range(5)]
+    statements = chain([Label("start", [Say("a", linenumber=2), Menu(choices, linenumber=3)], linenumber=1)])
+    next_getter = memoize(_next__minimalist)
+
+    for _, _, block in choices:
+        assert next_getter(block[0], False) is block[0] # Not skipped, nothing cached
+    assert next_getter.stats["hits"] == 0
+
+    label = statements[0]
+    assert next_getter(label) is statements[2] # Walks over the say
+    assert next_getter(label) is statements[2]
+    assert next_getter.stats["hits"] == 1
+    assert next_getter.stats["calls"] == 7
@@ -0,0 +1,13 @@
+"""Nodes showing the same screens must share one state"""
+from renpath.screens import NO_SCREENS, screen_state
+
+
+
+def test_state_does_not_depend_on_order():
+    a, b = object(), object()
+    shown = NO_SCREENS.show("a", a).show("b", b)
+
+    assert NO_SCREENS.show("b", b).show("a", a) is shown
+    assert screen_state({"b": b, "a": a}) is shown
+    assert shown.hide("a") is NO_SCREENS.show("b", b)
+    assert shown.hide("a").hide("b") is NO_SCREENS
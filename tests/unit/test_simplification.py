@@ -0,0 +1,82 @@
+"""The worklist simplification must do exactly what the previous algorithm did"""
+import pytest
+from conftest import load
+from synthetic import generate
+
+from renpath import renpy
+from renpath.classes.edge import Edge
+from renpath.conditions import disjunction
+from renpath.conversion import convert
+from renpath.node_generation import _next__minimalist, _next__normal
+from renpath.simplification import _PYTHON_IGNORE_RE, _classify, _keep, _remove_node, _remove_screen_defaults, simplify
+
+
+
+def simplify_until_stable(graph, simplify_menus):
+    """simplify before the worklists: every node is scanned again until nothing changes"""
+    classifications = {}
+    changed = True
+    while changed:
+        changed = False
+
+        for node in graph.nodes:
+            if not graph.has_node(node):
+                continue # Already removed
+            classification = classifications.get(node)
+            if classification is None:
+                classification = classifications[node] = _classify(node, _PYTHON_IGNORE_RE)
+            if _keep(node, classification):
+                continue
+            _remove_node(node, graph)
+            changed = True
+
+        for node in graph.nodes:
+            if not graph.has_node(node):
+                continue # Already removed
+            if not (isinstance(node.origin, renpy.ast.If) or (simplify_menus and isinstance(node.origin, renpy.ast.Menu))):
+                continue
+            grouped_edges = {}
+            for edge in node.children:
+                grouped_edges.setdefault(edge.end, []).append(edge)
+            for end, group in grouped_edges.items():
+                if len(group) == 1:
+                    continue
+                condition = disjunction(edge.condition for edge in group)
+                for edge in group:
+                    node.children.remove(edge)
+                    end.parents.remove(edge)
+                    graph.remove_edge(edge)
+                edge = Edge(node, end, condition)
+                node.children.add(edge)
+                end.parents.add(edge)
+                graph.add_edge(edge)
+            if len(node.children) <= 1:
+                if len(node.children) > 1 and any(isinstance(parent.start.origin, renpy.ast.Menu) for parent in node.parents):
+                    continue
+                _remove_node(node, graph)
+                changed = True
+
+    _remove_screen_defaults(graph)
+
+def snapshot(graph):
+    """Everything simplify changes, in order"""
+    location = lambda node: (node.origin.filename, node.origin.linenumber)
+    edge = lambda edge: (location(edge.start), location(edge.end), str(edge.condition), edge.choice)
+    return (
+        [(location(node), [edge(child) for child in node.children], [edge(parent) for parent in node.parents]) for node in graph.nodes],
+        [edge(e) for e in graph.edges],
+    )
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("simplify_menus", [False, True])
+@pytest.mark.parametrize("next_getter", [_next__minimalist, _next__normal])
+def test_same_as_until_stable(seed, simplify_menus, next_getter):
+    script, screens = generate(labels=25, fanout=2 + seed % 3, call_depth=seed % 3, if_chain=1 + seed, screens=seed % 2, says=2, seed=seed)
+    load(script, screens)
+
+    expected = convert(script.lookup("start"), None, next_getter)
+    simplify_until_stable(expected, simplify_menus)
+    graph = convert(script.lookup("start"), None, next_getter)
+    simplify(graph, simplify_menus)
+
+    assert snapshot(graph) == snapshot(expected)
@@ -0,0 +1,25 @@
+"""Labels must resolve as Ren'Py resolves them"""
+from conftest import load, renpy
+from standin import Jump, Label, Return, Script, chain
+
+from renpath.conversion import convert
+from renpath.node_generation import _next__normal
+from renpath.utility import lookup_or_none, unresolved_labels
+
+
+
+def test_label_overridden(monkeypatch):
+    script = load(Script(chain([
+        Label("start", [Jump("old", linenumber=2)], linenumber=1),
+        Label("old", [Return(linenumber=4)], linenumber=3),
+        Label("new", [Return(linenumber=6)], linenumber=5),
+        Label("gone", [Jump("missing", linenumber=8)], linenumber=7),
+    ])))
+    monkeypatch.setitem(renpy.config.label_overrides, "old", "new")
+    monkeypatch.setitem(renpy.config.label_overrides, "missing", "new")
+
+    assert lookup_or_none("old") is script.lookup("new")
+    assert lookup_or_none("missing") is script.lookup("new")
+    assert unresolved_labels() == []
+    graph = convert(script.lookup("start"), None, _next__normal)
+    assert sorted(node.origin.linenumber for node in graph.nodes) == [1, 2, 5, 6]